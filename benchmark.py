@@ -0,0 +1,157 @@
+"""Benchmark of concept existence tests, propagation and navigation
+over seeded random contexts.
+
+Results are written as JSON, one record per measure:
+
+    python3 benchmark.py --sizes 4 6 --arities 2 3 --output bench.json
+
+"""
+
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import itertools
+
+import dyadic
+import nconcept
+import navigation
+import navigation_classic
+from context import Context
+
+
+def make_context(arity:int, size:int, density:float, seed:int) -> Context:
+    """Return a seeded random context of given arity, with size elements
+    per dimension.
+
+    Labels are valid ASP constants, so the context is usable
+    with navigation_classic too.
+
+    """
+    dimensions = tuple({'{}{}'.format('abcdefgh'[dim], idx) for idx in range(size)}
+                       for dim in range(arity))
+    return Context.with_random_relations(dimensions, density, seed=seed)
+
+
+def engines(context:Context) -> dict:
+    """Return {name: (build time, have_concept function)} of engines usable
+    on given context."""
+    found = {'one-shot': (0., nconcept.have_concept)}
+    start = time.perf_counter()
+    session = nconcept.Session(context)
+    found['session'] = (time.perf_counter() - start, session.have_concept)
+    if len(context.sets) == 2:
+        start = time.perf_counter()
+        engine = dyadic.DyadicEngine(context)
+        found['dyadic'] = (time.perf_counter() - start, engine.have_concept)
+    return found
+
+
+def timed(func, *args, **kwargs) -> (float, object):
+    """Return the wall time taken by given call, and its result"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_have_concept(context:Context, seed:int, probes:int) -> iter:
+    """Yield one record per engine, timing probes with random constraints"""
+    for name, (build_time, have_concept) in engines(context).items():
+        rng = random.Random(seed)
+        times = [timed(have_concept, context, navigation.random_constraints(context, rng))[0]
+                 for _ in range(probes)]
+        yield {'benchmark': 'have_concept', 'engine': name, 'build': build_time, 'seconds': times}
+
+
+def bench_propagate(context:Context, repeat:int) -> iter:
+    """Yield one record per engine and propagation mode, timing a full
+    propagation from no constraints."""
+    empty = {idx: (set(), set()) for idx in range(len(context.sets))}
+    for name, (build_time, have_concept) in engines(context).items():
+        times = [timed(navigation.propagate, context, empty, have_concept)[0]
+                 for _ in range(repeat)]
+        yield {'benchmark': 'propagate', 'engine': name, 'build': build_time, 'seconds': times}
+    session = nconcept.Session(context)
+    times = [timed(navigation.propagate_by_consequences, context, empty, session)[0]
+             for _ in range(repeat)]
+    yield {'benchmark': 'propagate', 'engine': 'consequences', 'build': 0., 'seconds': times}
+    times = [timed(navigation.propagate_batched, context, empty)[0]
+             for _ in range(repeat)]
+    yield {'benchmark': 'propagate', 'engine': 'batched', 'build': 0., 'seconds': times}
+
+
+def bench_navigation(context:Context, seed:int, repeat:int) -> iter:
+    """Yield one record per navigator, timing navigations driven by seeded
+    random decisions."""
+    for _ in range(repeat):
+        rng = random.Random(seed)
+        start, rounds = time.perf_counter(), 0
+        finder = navigation.find_concepts_interactively(context)
+        try:
+            _, induced = next(finder)
+            while True:
+                rounds += 1
+                _, induced = finder.send(navigation.random_pick(induced, context, rng))
+        except StopIteration:
+            pass
+        yield {'benchmark': 'navigation', 'engine': 'navigation', 'rounds': rounds,
+               'seconds': [time.perf_counter() - start]}
+
+    if len(context.sets) != 2:
+        return
+    for _ in range(repeat):
+        rng, rounds = random.Random(seed), 0
+        def choose(context, constraints):
+            nonlocal rounds
+            rounds += 1
+            return navigation.random_pick({idx: tuple(constraint) for idx, constraint in enumerate(constraints)},
+                               context, rng)
+        seconds, _ = timed(navigation_classic.find_concepts_interactively, context, choose)
+        yield {'benchmark': 'navigation', 'engine': 'navigation_classic', 'rounds': rounds,
+               'seconds': [seconds]}
+
+
+def run(sizes:iter, arities:iter, densities:iter, seed:int, probes:int, repeat:int) -> iter:
+    """Yield all benchmark records"""
+    for arity, size, density in itertools.product(arities, sizes, densities):
+        context = make_context(arity, size, density, seed)
+        description = {'arity': arity, 'size': size, 'density': density, 'seed': seed,
+                       'relations': len(context.relations)}
+        measures = itertools.chain(
+            bench_have_concept(context, seed, probes),
+            bench_propagate(context, repeat),
+            bench_navigation(context, seed, repeat),
+        )
+        for record in measures:
+            record['context'] = description
+            yield record
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 6])
+    parser.add_argument('--arities', type=int, nargs='+', default=[2, 3])
+    parser.add_argument('--densities', type=float, nargs='+', default=[0.3, 0.6])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--probes', type=int, default=20,
+                        help='number of have_concept calls per engine')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of propagations and navigations per engine')
+    parser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout)
+    args = parser.parse_args()
+
+    results = list(run(args.sizes, args.arities, args.densities,
+                       args.seed, args.probes, args.repeat))
+    json.dump({
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }, args.output, indent=1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,147 @@
+"""Caching of concept existence queries.
+
+Membership constraints are monotone: if a set of constraints
+allows no concept, neither does any superset of it, and if it allows
+a concept, so does any subset of it.
+The cache uses that to answer queries it never saw.
+
+"""
+
+
+import threading
+from collections import Counter, OrderedDict, namedtuple
+
+import nconcept
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits, dominance_hits, misses, maxsize, currsize')
+
+
+class ConceptCache:
+    """Bounded LRU cache in front of a have_concept function.
+
+    Entries are keyed by the context fingerprint and the frozen constraints.
+    A query is answered by an exact lookup, or else by a cached unsatisfiable
+    subset or a cached satisfiable superset of it, found through an index
+    of the entries by decided element.
+    Instances can be shared by threads.
+
+    """
+
+    def __init__(self, have_concept=nconcept.have_concept, maxsize:int=1024):
+        self.function = have_concept
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # (fingerprint, frozen constraints) -> bool
+        # for unsatisfiable and satisfiable entries, (fingerprint, idx, elem, side) -> keys,
+        #  with also (fingerprint,) -> all keys, and (fingerprint, None) -> keys without decision
+        self.postings = ({}, {})
+        self.hits = self.dominance_hits = self.misses = 0
+        self._context, self._fingerprint = None, None
+        self.lock = threading.Lock()
+
+
+    def have_concept(self, context, constraints) -> bool:
+        """True if given constraints allows existance of at least one concept
+        in the given context.
+
+        Same signature as nconcept.have_concept.
+
+        """
+        with self.lock:
+            key = self.fingerprint(context), freeze_constraints(constraints)
+            if key in self.entries:
+                self.hits += 1
+                nconcept.STATS.add(cache_hits=1)
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            dominant = self.dominant_entry(*key)
+            if dominant:
+                self.dominance_hits += 1
+                nconcept.STATS.add(cache_hits=1)
+                self.entries.move_to_end(dominant)
+                return self.entries[dominant]
+            self.misses += 1
+        nconcept.STATS.add(cache_misses=1)
+
+        # the lock is released while solving, so threads can share the cache
+        satisfiable = self.function(context, constraints)
+        with self.lock:
+            if key not in self.entries:
+                self._index(key, satisfiable, add=True)
+            self.entries[key] = satisfiable
+            if len(self.entries) > self.maxsize:
+                self._index(*self.entries.popitem(last=False), add=False)
+        return satisfiable
+
+
+    def dominant_entry(self, fingerprint:str, constraints:tuple) -> tuple or None:
+        """Return the key of an entry giving the answer for given constraints
+        by monotony, or None if there is none.
+
+        """
+        unsatisfiable, satisfiable = self.postings
+        decisions = _decisions(fingerprint, constraints)
+        if unsatisfiable.get((fingerprint, None)):
+            return next(iter(unsatisfiable[fingerprint, None]))
+        # an unsatisfiable subset has all its decisions among the query ones
+        counts = Counter(key for decision in decisions for key in unsatisfiable.get(decision, ()))
+        for key, count in counts.items():
+            if count == sum(len(required) + len(forbidden) for required, forbidden in key[1]):
+                return key
+        # a satisfiable superset has all the query decisions
+        postings = sorted((satisfiable.get(decision, set()) for decision in decisions), key=len)
+        supersets = set.intersection(*postings) if postings else satisfiable.get((fingerprint,))
+        return next(iter(supersets)) if supersets else None
+
+    def _index(self, key:tuple, satisfiable:bool, add:bool):
+        """Add given entry key to the postings, or remove it"""
+        postings = self.postings[satisfiable]
+        decisions = _decisions(*key) or [(key[0], None)]
+        for decision in decisions + [(key[0],)]:
+            if add:
+                postings.setdefault(decision, set()).add(key)
+            else:
+                postings[decision].discard(key)
+                if not postings[decision]:
+                    del postings[decision]
+
+
+    def fingerprint(self, context) -> str:
+        """Return the fingerprint of given context, computed once per context"""
+        if self._context is not context:
+            self._context, self._fingerprint = context, context.fingerprint()
+        return self._fingerprint
+
+
+    def cache_info(self) -> CacheInfo:
+        """Return the hit and miss counters, like functools.lru_cache does"""
+        with self.lock:
+            return CacheInfo(self.hits, self.dominance_hits, self.misses,
+                             self.maxsize, len(self.entries))
+
+    def cache_clear(self):
+        """Forget all entries and reset counters"""
+        with self.lock:
+            self.entries.clear()
+            self.postings = ({}, {})
+            self.hits = self.dominance_hits = self.misses = 0
+
+
+def freeze_constraints(constraints:dict) -> tuple:
+    """Return the canonical, hashable form of given constraints:
+    a tuple of (required, forbidden) frozensets ordered by dimension index.
+
+    >>> freeze_constraints({1: ({'b'}, set()), 0: (set(), {'a'})})
+    ((frozenset(), frozenset({'a'})), (frozenset({'b'}), frozenset()))
+
+    """
+    return tuple((frozenset(constraints[idx][0]), frozenset(constraints[idx][1]))
+                 for idx in sorted(constraints))
+
+
+def _decisions(fingerprint:str, constraints:tuple) -> list:
+    """Return the (fingerprint, idx, elem, side) of the elements decided
+    by given frozen constraints, side being 0 if required, 1 if forbidden."""
+    return [(fingerprint, idx, elem, side) for idx, pair in enumerate(constraints)
+            for side, elems in enumerate(pair) for elem in elems]
+
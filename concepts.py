@@ -0,0 +1,51 @@
+"""Enumeration of all the n-concepts of a context, streamed one per line.
+
+    python3 concepts.py data.lp
+    python3 concepts.py context.nvc --pivots 64 --jobs 8 --format json
+
+"""
+
+
+import sys
+import json
+import argparse
+
+import loaders
+import nconcept
+
+
+def pretty_concept(concept:tuple) -> str:
+    """Pretty print of given n-concept"""
+    return '{' + '} × {'.join(','.join(sorted(dim)) for dim in concept) + '}'
+
+
+def json_concept(concept:tuple) -> str:
+    """JSON encoding of given n-concept"""
+    return json.dumps([sorted(dim) for dim in concept])
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('context', help='context file, see loaders.py for formats')
+    parser.add_argument('--input-format', default=None, help='format of context file'
+                        ' (default: guessed from extension)')
+    parser.add_argument('--pivots', type=int, default=0,
+                        help='split the search in pivots+1 parts, enumerated in parallel')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='number of processes used when splitting (default: all cores)')
+    parser.add_argument('--format', choices=('text', 'json'), default='text')
+    parser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout)
+    args = parser.parse_args()
+
+    context = loaders.load(args.context, args.input_format)
+    if args.pivots:
+        concepts = nconcept.iter_concepts_in_parallel(context, args.pivots, args.jobs)
+    else:
+        concepts = nconcept.iter_concepts(context)
+    encode = json_concept if args.format == 'json' else pretty_concept
+    for concept in concepts:
+        args.output.write(encode(concept) + '\n')
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,31 +1,57 @@
 """Definition of the context class as a namedtuple,
+its integer-indexed alternative backed by numpy,
 and definitions laying around.
 
 """
 
 
 import random
-import itertools
+import hashlib
 from collections import namedtuple
 
+import numpy
+
 
 class Context(namedtuple('ContextBase', 'sets, relations')):
 
 
     @staticmethod
-    def with_random_relations(dimensions:tuple, density:float=0.5):
+    def with_random_relations(dimensions:tuple, density:float=0.5, seed:int=None):
         """Return a new Context instance where relations are randomly choosen,
         with a density roughly equal to given ratio.
 
+        Given seed makes the relations reproducible, otherwise the numpy
+        generator is seeded with the random module, so random.seed() does.
+
         """
         assert 0. <= density <= 1.
-        # NB: tuple is important: order must be kept in order to get
-        #  consistant ASP program.
-        relations = (tuple(rel) for rel in itertools.product(*dimensions)
-                     if random.random() < density)
+        # NB: cells are drawn in the order of the sorted elements, so the same
+        #  seed gives the same relations whatever the order of the sets.
+        rng = random if seed is None else random.Random(seed)
+        labels = tuple(sorted(dim) for dim in dimensions)
+        cells = numpy.random.default_rng(rng.getrandbits(64)).random(tuple(map(len, labels)))
+        relations = (tuple(dim[idx] for dim, idx in zip(labels, ids))
+                     for ids in numpy.argwhere(cells < density).tolist())
         return Context(dimensions, frozenset(relations))
 
 
+    def iter_relations(self) -> iter:
+        """Yield the related elements, one tuple per relation"""
+        return iter(self.relations)
+
+    def fingerprint(self) -> str:
+        """Return a digest of the context content, independant of
+        the order of elements in sets, and equal to the one of
+        the equivalent ArrayContext.
+
+        """
+        labels = tuple(tuple(sorted(dim)) for dim in self.sets)
+        ids = tuple({label: idx for idx, label in enumerate(dim)} for dim in labels)
+        coordinates = numpy.array([[dim_ids[elem] for dim_ids, elem in zip(ids, relation)]
+                                   for relation in self.relations], dtype=numpy.int64)
+        return _digest(labels, coordinates.reshape(-1, len(labels)))
+
+
     def __str__(self) -> str:
         return self.__pretty_print() if len(self.sets) == 2 else repr(self)
 
@@ -38,3 +64,190 @@ class Context(namedtuple('ContextBase', 'sets, relations')):
         return out
 
 
+
+class ArrayContext:
+    """Context where elements are interned to integer ids, and the incidence
+    relation is stored with numpy, using one of the following storages:
+
+        dense -- n-dimensional boolean array
+        packed -- same array, flattened and packed 8 cells per byte
+        sparse -- integer array of the ids of related elements, one row per relation
+
+    The sets and relations attributes give the same view as Context,
+    the sets being built on first access, and the relations on each access:
+    iter_relations() yields them without holding them all.
+
+    """
+    STORAGES = {'dense', 'packed', 'sparse'}
+    CHUNK_SIZE = 4096  # relations converted to labels at once by iter_relations()
+
+    def __init__(self, labels:tuple, incidence:numpy.ndarray, storage:str='dense'):
+        assert storage in self.STORAGES
+        self.labels = tuple(tuple(dim) for dim in labels)
+        self.ids = tuple({label: idx for idx, label in enumerate(dim)}
+                         for dim in self.labels)
+        self.shape = tuple(len(dim) for dim in self.labels)
+        self.incidence = incidence
+        self.storage = storage
+        self._sets = None
+
+
+    @staticmethod
+    def from_coordinates(labels:tuple, coordinates, storage:str='dense'):
+        """Return a new ArrayContext, from the ids of related elements,
+        given as an array with one row per relation.
+
+        """
+        shape = tuple(len(dim) for dim in labels)
+        coordinates = numpy.asarray(coordinates, dtype=numpy.int64).reshape(-1, len(shape))
+        if storage == 'sparse':
+            flat = numpy.unique(numpy.ravel_multi_index(coordinates.T, shape))
+            incidence = numpy.stack(numpy.unravel_index(flat, shape), axis=1)
+        else:
+            dense = numpy.zeros(shape, dtype=bool)
+            dense[tuple(coordinates.T)] = True
+            incidence = _packed(dense) if storage == 'packed' else dense
+        return ArrayContext(labels, incidence, storage)
+
+    @staticmethod
+    def from_context(context:Context, storage:str='dense'):
+        """Return a new ArrayContext with the same content as given context"""
+        labels = tuple(tuple(sorted(dim)) for dim in context.sets)
+        ids = tuple({label: idx for idx, label in enumerate(dim)} for dim in labels)
+        coordinates = [[dim_ids[elem] for dim_ids, elem in zip(ids, relation)]
+                       for relation in context.relations]
+        return ArrayContext.from_coordinates(labels, coordinates, storage)
+
+    @staticmethod
+    def with_random_relations(dimensions:tuple, density:float=0.5,
+                              storage:str='dense', seed:int=None):
+        """Return a new ArrayContext instance where relations are randomly
+        choosen, with a density roughly equal to given ratio.
+
+        With the sparse storage, the related cells are drawn directly,
+        without building the full array.
+
+        """
+        assert 0. <= density <= 1.
+        labels = tuple(tuple(dim) for dim in dimensions)
+        shape = tuple(len(dim) for dim in labels)
+        rng = numpy.random.default_rng(seed)
+        if storage == 'sparse':
+            size = int(numpy.prod(shape))
+            flat = numpy.sort(rng.choice(size, rng.binomial(size, density), replace=False))
+            incidence = numpy.stack(numpy.unravel_index(flat, shape), axis=1)
+            return ArrayContext(labels, incidence, storage)
+        dense = rng.random(shape) < density
+        return ArrayContext(labels, _packed(dense) if storage == 'packed' else dense, storage)
+
+
+    def dense(self) -> numpy.ndarray:
+        """Return the incidence as a n-dimensional boolean array"""
+        if self.storage == 'dense':
+            return self.incidence
+        if self.storage == 'packed':
+            size = int(numpy.prod(self.shape))
+            return numpy.unpackbits(self.incidence, count=size).reshape(self.shape).astype(bool)
+        dense = numpy.zeros(self.shape, dtype=bool)
+        dense[tuple(self.incidence.T)] = True
+        return dense
+
+    def coordinates(self) -> numpy.ndarray:
+        """Return the ids of related elements, one row per relation"""
+        if self.storage == 'sparse':
+            return self.incidence
+        return numpy.argwhere(self.dense())
+
+    def with_storage(self, storage:str):
+        """Return the same context using given storage"""
+        if storage == self.storage:
+            return self
+        if storage == 'sparse':
+            return ArrayContext(self.labels, self.coordinates(), storage)
+        dense = self.dense()
+        return ArrayContext(self.labels, _packed(dense) if storage == 'packed' else dense, storage)
+
+    def holds(self, *elements) -> bool:
+        """True if given elements, one per dimension, are related"""
+        ids = tuple(dim_ids[elem] for dim_ids, elem in zip(self.ids, elements))
+        if self.storage == 'dense':
+            return bool(self.incidence[ids])
+        if self.storage == 'packed':
+            flat = int(numpy.ravel_multi_index(ids, self.shape))
+            return bool(self.incidence[flat >> 3] >> (7 - (flat & 7)) & 1)
+        return bool((self.incidence == ids).all(axis=1).any())
+
+    def density(self) -> float:
+        """Return the ratio of related cells"""
+        size = int(numpy.prod(self.shape))
+        if self.storage == 'dense':
+            related = int(numpy.count_nonzero(self.incidence))
+        elif self.storage == 'packed':
+            related = int(numpy.bitwise_count(self.incidence).sum())
+        else:
+            related = len(self.incidence)
+        return related / size if size else 0.
+
+
+    @property
+    def sets(self) -> tuple:
+        if self._sets is None:
+            self._sets = tuple(set(dim) for dim in self.labels)
+        return self._sets
+
+    @property
+    def relations(self) -> frozenset:
+        return frozenset(self.iter_relations())
+
+    def iter_relations(self) -> iter:
+        """Yield the related elements, one tuple of labels per relation"""
+        coordinates = self.coordinates()
+        for start in range(0, len(coordinates), self.CHUNK_SIZE):
+            for ids in coordinates[start:start+self.CHUNK_SIZE].tolist():
+                yield tuple(dim[idx] for dim, idx in zip(self.labels, ids))
+
+    def to_context(self) -> Context:
+        """Return the equivalent Context"""
+        return Context(self.sets, self.relations)
+
+    def fingerprint(self) -> str:
+        """Return a digest of the context content, independant of
+        the order of elements in labels, and equal to the one of
+        the equivalent Context.
+
+        """
+        order = tuple(numpy.argsort(numpy.array(dim, dtype=object), kind='stable')
+                      for dim in self.labels)
+        ranks = tuple(numpy.argsort(dim_order) for dim_order in order)
+        coordinates = self.coordinates()
+        canonical = numpy.stack([rank[coordinates[:, idx]] for idx, rank in enumerate(ranks)],
+                                axis=1) if len(coordinates) else coordinates
+        labels = tuple(tuple(dim[idx] for idx in dim_order)
+                       for dim, dim_order in zip(self.labels, order))
+        return _digest(labels, canonical.astype(numpy.int64).reshape(-1, len(labels)))
+
+    def __str__(self) -> str:
+        return str(self.to_context())
+
+    def __repr__(self) -> str:
+        return 'ArrayContext(shape={}, storage={}, relations={})'.format(
+            self.shape, self.storage, len(self.coordinates()))
+
+
+def _digest(labels:tuple, coordinates:numpy.ndarray) -> str:
+    """Return the fingerprint of a context, given by its sorted elements per
+    dimension, and the ids of related elements in them, one row per relation.
+
+    Both Context and ArrayContext use it, so they agree on the same content.
+
+    """
+    digest = hashlib.sha1()
+    for dim in labels:
+        digest.update(repr(list(dim)).encode())
+    digest.update(numpy.unique(coordinates, axis=0).tobytes())
+    return digest.hexdigest()
+
+
+def _packed(dense:numpy.ndarray) -> numpy.ndarray:
+    """Return given boolean array flattened and packed 8 cells per byte"""
+    return numpy.packbits(dense.ravel())
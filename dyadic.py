@@ -0,0 +1,112 @@
+"""Implementation of search for dyadic concepts, using the derivation
+operators on integer bitsets instead of ASP.
+
+Only usable on 2-dimensional contexts.
+
+"""
+
+
+from context import Context
+
+
+class DyadicEngine:
+    """Concept existence test bound to a dyadic context.
+
+    Elements of each dimension are mapped to bit positions, and the
+    incidence is kept as one attribute bitmask per object (rows)
+    and one object bitmask per attribute (columns).
+
+    """
+
+    def __init__(self, context:Context):
+        assert len(context.sets) == 2, "Dyadic engine needs a 2-dimensional context"
+        self.context = context
+        self.elements = tuple(tuple(sorted(dim)) for dim in context.sets)
+        self.positions = tuple({elem: pos for pos, elem in enumerate(elems)}
+                               for elems in self.elements)
+        self.full = tuple((1 << len(elems)) - 1 for elems in self.elements)
+        self.rows = [0] * len(self.elements[0])
+        self.cols = [0] * len(self.elements[1])
+        ones, twos = self.positions
+        for one, two in context.iter_relations():
+            self.rows[ones[one]] |= 1 << twos[two]
+            self.cols[twos[two]] |= 1 << ones[one]
+
+
+    def have_concept(self, context, constraints) -> bool:
+        """True if given constraints allows existance of at least one concept
+        in the engine context.
+
+        Same signature as nconcept.have_concept.
+
+        """
+        assert context is self.context, "Engine is bound to another context"
+        (req_one, forb_one), (req_two, forb_two) = (
+            tuple(self.mask(idx, elems) for elems in constraints[idx])
+            for idx in range(2)
+        )
+        # Close-by-One search over the extents containing the required objects.
+        #  Extents only grow and intents only shrink during the search,
+        #  so a forbidden object or a missing required attribute prunes a branch.
+        start = self.extent(self.intent(req_one))
+        stack = [(start, self.intent(start), 0)]
+        while stack:
+            extent, intent, first = stack.pop()
+            if extent & forb_one or intent & req_two != req_two or not intent:
+                continue
+            if extent and not intent & forb_two:
+                return True
+            for obj in range(first, len(self.rows)):
+                bit = 1 << obj
+                if extent & bit or forb_one & bit:
+                    continue
+                new_intent = intent & self.rows[obj]
+                new_extent = self.extent(new_intent)
+                if (new_extent ^ extent) & (bit - 1):
+                    continue  # not canonical: already reached from another branch
+                stack.append((new_extent, new_intent, obj + 1))
+        return False
+
+
+    def mask(self, idx:int, elems) -> int:
+        """Return the bitmask of given elements of dimension idx.
+        Elements unknown to the context are ignored."""
+        positions = self.positions[idx]
+        mask = 0
+        for elem in elems:
+            if elem in positions:
+                mask |= 1 << positions[elem]
+        return mask
+
+    def intent(self, extent:int) -> int:
+        """Return the attributes shared by all objects of given extent"""
+        return _intersection(self.rows, extent, self.full[1])
+
+    def extent(self, intent:int) -> int:
+        """Return the objects having all attributes of given intent"""
+        return _intersection(self.cols, intent, self.full[0])
+
+
+def _intersection(masks:list, selection:int, full:int) -> int:
+    """Return the intersection of masks indexed by selection bits"""
+    while selection and full:
+        low = selection & -selection
+        full &= masks[low.bit_length() - 1]
+        selection ^= low
+    return full
+
+
+_engine = None
+
+def have_concept(context:Context, constraints) -> bool:
+    """True if given constraints allows existance of at least one concept
+    in the given dyadic context.
+
+    The engine of the last context used is kept, so repeated calls
+    on the same context do not recompute the bitmasks.
+
+    """
+    global _engine
+    if _engine is None or _engine.context is not context:
+        _engine = DyadicEngine(context)
+    return _engine.have_concept(context, constraints)
@@ -3,12 +3,17 @@ a tkinter gui.
 
 """
 
+import queue
+import itertools
+import threading
 from functools import partial
 import tkinter as tk
 from tkinter import font
 
+import nconcept
 import navigation
 from context import Context
+from history import History
 from navigation import find_concepts_interactively
 
 
@@ -20,6 +25,170 @@ COLOR_ERR = 'red'
 COLOR_LOG = 'dark green'
 COLOR_OK = 'light green'
 COLOR_WAITING = '#fd6b14'
+POLL_DELAY = 50  # ms between two checks of the background search results
+VISIBLE_BUTTONS = 24  # buttons per dimension, other elements are reached by scrolling
+
+
+class Cancelled(Exception):
+    """Raised in a background search superseded by a newer one"""
+
+
+class Navigator:
+    """A navigation coroutine running its propagations in a background thread.
+
+    Decisions, rejected picks and results are put in given queue, tagged with the navigator,
+    so the Tk loop can ignore the ones of a cancelled navigator.
+    Once cancelled, a navigator stops at its next concept existence test
+    or history access, and can't be used anymore: it never changes
+    the history shared with the next navigators. Each step sent puts exactly one result in
+    the queue, 'step', 'found' or 'error' ; after the last two, the
+    navigator is over, and any further step only puts an error.
+
+    """
+
+    def __init__(self, context:Context, have_concept, results:queue.Queue, constraints:dict=None,
+                 history:History=None):
+        self.results = results
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()  # held while cancelling or using the history
+        self.history = None if history is None else _NavigatorHistory(history, self)
+        def checked_have_concept(context, constraints):
+            if self.cancelled.is_set():
+                raise Cancelled()
+            return have_concept(context, constraints)
+        self.coroutine = find_concepts_interactively(
+            context, have_concept=checked_have_concept, constraints=constraints, history=self.history,
+            on_decision=lambda *decision: results.put((self, 'decision', decision)),
+            on_reject=lambda pick: results.put((self, 'rejected', pick)),
+        )
+        self.run(partial(next, self.coroutine))
+
+    def send(self, user_pick:tuple):
+        self.run(partial(self.coroutine.send, user_pick))
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled.set()
+
+    def run(self, step):
+        """Run given coroutine step in a new thread"""
+        def target():
+            try:
+                result = step()
+                kind = 'step'
+            except StopIteration as last:
+                result, kind = last.value, 'found'
+            except Cancelled:
+                return
+            except Exception as error:
+                result, kind = error, 'error'
+            if kind == 'found' and result is None:
+                result, kind = RuntimeError('The navigation is over'), 'error'
+            try:
+                if kind != 'error':  # the coroutine will modify them in-place
+                    result = tuple(_copied(constraints) for constraints in result)
+            except Exception as error:
+                result, kind = error, 'error'
+            self.results.put((self, kind, result))
+        threading.Thread(target=target, daemon=True).start()
+
+
+class _NavigatorHistory:
+    """View of a History for a navigator, raising Cancelled on any access
+    once the navigator is cancelled."""
+
+    def __init__(self, history:History, navigator:Navigator):
+        self.history, self.navigator = history, navigator
+
+    def __getattr__(self, name:str):
+        method = getattr(self.history, name)
+        def checked(*args, **kwargs):
+            with self.navigator.lock:
+                if self.navigator.cancelled.is_set():
+                    raise Cancelled()
+                return method(*args, **kwargs)
+        return checked
+
+
+class DimensionView(tk.Frame):
+    """Buttons of the elements of a dimension.
+
+    Only a fixed pool of buttons is created, showing a window over the
+    sorted elements. Dimensions having more elements than buttons get
+    a scrollbar moving the window, and an entry filtering the elements
+    by substring.
+
+    """
+
+    def __init__(self, master, idx:int, elements:iter, colors:dict, on_click,
+                 nb_button:int=VISIBLE_BUTTONS):
+        super().__init__(master)
+        self.idx = idx
+        self.elements = sorted(elements)
+        self.colors = colors  # {elem: color}, shared with the application
+        self.on_click = on_click
+        self.shown, self.offset = self.elements, 0
+        self.window = {}  # elem -> button showing it
+        row = tk.Frame(self)
+        self.buttons = []
+        for position in range(min(nb_button, len(self.elements))):
+            button = tk.Button(row)
+            # actions
+            button.bind('<Button-1>', partial(self.click, position=position, decision='in'))
+            button.bind('<Button-2>', partial(self.click, position=position, decision=''))
+            button.bind('<Button-3>', partial(self.click, position=position, decision='out'))
+            button.pack(side='left')
+            self.buttons.append(button)
+        row.pack()
+        self.scrollbar = None
+        if len(self.elements) > nb_button:
+            self.filter = tk.StringVar(self)
+            self.filter.trace_add('write', lambda *_: self.apply_filter())
+            tk.Entry(self, textvariable=self.filter, width=12).pack(side='left')
+            self.scrollbar = tk.Scrollbar(self, orient='horizontal', command=self.scroll)
+            self.scrollbar.pack(side='left', fill='x', expand=True)
+        self.refresh()
+
+    def click(self, event, position:int, decision:str):
+        shown = self.shown[self.offset:self.offset+len(self.buttons)]
+        if position < len(shown):
+            self.on_click(event, self.idx, shown[position], decision)
+
+    def apply_filter(self):
+        """Show only the elements containing the filter text"""
+        text = self.filter.get()
+        self.shown = [elem for elem in self.elements if text in str(elem)] if text else self.elements
+        self.offset = 0
+        self.refresh()
+
+    def scroll(self, action:str, value:str, unit:str=None):
+        """Move the window as asked by the scrollbar"""
+        if action == 'moveto':
+            offset = int(float(value) * len(self.shown))
+        else:
+            offset = self.offset + int(value) * (1 if unit == 'units' else len(self.buttons))
+        self.offset = max(0, min(offset, len(self.shown) - len(self.buttons)))
+        self.refresh()
+
+    def refresh(self):
+        """Show the elements of the window in the buttons"""
+        shown = self.shown[self.offset:self.offset+len(self.buttons)]
+        self.window = dict(zip(shown, self.buttons))
+        for button, elem in itertools.zip_longest(self.buttons, shown):
+            if elem is None:
+                button.configure(text='', state='disabled', background=NO_COLOR)
+            else:
+                button.configure(text=str(elem), state='normal',
+                                 background=self.colors.get(elem, NO_COLOR))
+        if self.scrollbar:
+            size = max(len(self.shown), 1)
+            self.scrollbar.set(self.offset / size, (self.offset + len(self.buttons)) / size)
+
+    def recolor(self, elem):
+        """Update the color of the button of given element, if shown"""
+        button = self.window.get(elem)
+        if button is not None:
+            button['background'] = self.colors.get(elem, NO_COLOR)
 
 
 class Application(tk.Frame):
@@ -34,51 +203,32 @@ class Application(tk.Frame):
         super().__init__(master)
         self.master.wm_title(DEFAULT_WM_TITLE)
         self.context = context
+        self.have_concept = nconcept.Session(context).have_concept
+        self.results = queue.Queue()
+        self.navigator = None
+        self.colors = tuple({} for _ in context.sets)  # {elem: color} of colored elements
+        self.history = History()  # shared by successive navigators
+        self.master.bind('<Control-z>', self.restore_previous)
+        self.master.bind('<Control-y>', self.restore_next)
+        self.create_widgets()
         self.reset_constraints()
+        self.after(POLL_DELAY, self.poll_results)
 
     def create_widgets(self):
-        # delete existing ones
-        for child in self.winfo_children():
-            child.destroy()
-        buttons = {}
+        """Create all widgets, once: buttons are then only recolored,
+        see show_constraints()."""
+        self.views = []
         for idx, dim in enumerate(self.context.sets):
-            requireds, forbiddens = self.constraints[idx]
-            user_requireds, user_forbiddens = self.user_constraints[idx]
-            dim_buttons = tk.Frame(master=self)
-            for elem in sorted(dim, reverse=True):
-                button = tk.Button(dim_buttons, text=str(elem))
-                # actions
-                button.bind('<Button-1>', partial(self.choose_elem, dim_idx=idx, elem=elem, decision='in'))
-                button.bind('<Button-2>', partial(self.choose_elem, dim_idx=idx, elem=elem, decision=''))
-                button.bind('<Button-3>', partial(self.choose_elem, dim_idx=idx, elem=elem, decision='out'))
-                # color
-                required = elem in requireds
-                forbidden = elem in forbiddens
-                user_required = elem in user_requireds
-                user_forbidden = elem in user_forbiddens
-                if forbidden and required:
-                    raise ValueError("Element {} is both required and forbidden. That's unexpected.".format(elem))
-                if user_required:
-                    button['background'] = 'green'
-                elif required:
-                    button['background'] = 'light green'
-                elif user_forbidden:
-                    button['background'] = 'red'
-                elif forbidden:
-                    button['background'] = 'pink'
-                buttons[idx, elem] = button
-                button.pack(side='right')
-            dim_buttons.pack()
-        self.buttons = buttons
-
-        self.reset = tk.Button(self, text="", fg="blue",
+            view = DimensionView(self, idx, dim, self.colors[idx], self.choose_elem)
+            view.pack()
+            self.views.append(view)
+
+        self.reset = tk.Button(self, text="", fg="blue",
                                command=self.reset_constraints)
-        self.quit = tk.Button(self, text="", fg="red",
+        self.quit = tk.Button(self, text="", fg="red",
                               command=self.master.destroy)
-        self.previous = tk.Button(self, text="", fg="green",
+        self.previous = tk.Button(self, text="", fg="green",
                                   command=self.restore_previous)
-        self.current_error = tk.StringVar(self, value=' ' * 40)
-        self.logline = tk.Label(self, textvariable=self.current_error)
         self.quit.pack(side="bottom")
         self.reset.pack(side="bottom")
         self.previous.pack(side="bottom")
@@ -92,6 +242,36 @@ class Application(tk.Frame):
         self.pack()
 
 
+    def show_constraints(self, user_constraints:dict, constraints:dict):
+        """Recolor the buttons of the elements whose state changed since
+        the last constraints shown.
+
+        Only elements decided before or now can have changed, so undecided
+        elements of large dimensions cost nothing.
+
+        """
+        for idx, view in enumerate(self.views):
+            requireds, forbiddens = constraints[idx]
+            user_requireds, user_forbiddens = user_constraints[idx]
+            if requireds & forbiddens:
+                raise ValueError("Elements {} are both required and forbidden. That's unexpected."
+                                 "".format(requireds & forbiddens))
+            colors = self.colors[idx]
+            for elem in set(colors) | requireds | forbiddens:
+                if elem in user_requireds:
+                    color = 'green'
+                elif elem in requireds:
+                    color = 'light green'
+                elif elem in user_forbiddens:
+                    color = 'red'
+                elif elem in forbiddens:
+                    color = 'pink'
+                else:
+                    color = NO_COLOR
+                if colors.get(elem, NO_COLOR) != color:
+                    self.set_color(idx, elem, color)
+
+
     def err(self, msg:str):
         """Report given error message to user"""
         self.lab_error.configure(fg=COLOR_ERR)
@@ -116,37 +296,130 @@ class Application(tk.Frame):
         initialize a search, and each time user ask to reset.
 
         """
-        self.coroutine = find_concepts_interactively(self.context)
-        try:
-            self.user_constraints, self.constraints = next(self.coroutine)
-        except StopIteration as last:
-            self.show_found_concept(last.value)
-        else:
-            self.create_widgets()
+        self.user_constraints = {idx: (set(), set()) for idx in range(len(self.context.sets))}
+        self.constraints = _copied(self.user_constraints)
+        self.show_constraints(self.user_constraints, self.constraints)
+        self.start_navigation(None)
 
 
-    def restore_previous(self):
-        """Restore the previous state"""
-        idx, elem, decision = self._last_user_input
-        self.choose_elem(None, idx, elem, '')
+    def start_navigation(self, constraints:dict or None):
+        """Start a new navigation from given user constraints,
+        cancelling the running one if any.
+
+        """
+        if self.navigator:
+            self.navigator.cancel()
+        self.running, self.finished = True, False
+        self.pending_constraints = constraints or {idx: (set(), set()) for idx in range(len(self.context.sets))}
+        self.navigator = Navigator(self.context, self.have_concept, self.results,
+                                   _copied(self.pending_constraints), self.history)
+        self.info('STARTING CONCEPT SEARCH…')
+
+
+    def restore_previous(self, event=None):
+        """Restore the state before the last user choice.
+
+        If the search of the last choice is still running, it is cancelled
+        and the state shown before it is restored.
+
+        """
+        if self.running:
+            state = self.history.current()
+        elif self.finished:
+            state = self.history.undo()
+        else:
+            self.running = True
+            self.navigator.send('undo')
+            return
+        if state:
+            self.start_navigation(state[0])
+
+    def restore_next(self, event=None):
+        """Restore the state undone by the last restore_previous"""
+        if self.running or self.finished:
+            return
+        self.running = True
+        self.navigator.send('redo')
 
 
     def choose_elem(self, event, dim_idx:set, elem:str, decision:str):
         """Callback when user have choosen an object to put in, out or unknow
         of the searched concept.
 
+        The search runs in background. If the previous search is still
+        running (or is over), a new one starts from its constraints
+        updated with the new choice, and the previous is cancelled.
+
         """
         self._last_user_input = dim_idx, elem, decision
-        # self.info('STARTING CONCEPT SEARCH…')
         assert decision in {'in', 'out', ''}
+        if not decision and elem not in set.union(*self.pending_constraints[dim_idx]):
+            return  # nothing to retract
+        constraints = navigation.update_constraints(_copied(self.pending_constraints), *self._last_user_input)
+        if self.running or self.finished:
+            self.start_navigation(constraints)
+        else:
+            self.running = True
+            self.pending_constraints = constraints
+            self.navigator.send(self._last_user_input)
+            self.info('STARTING CONCEPT SEARCH…')
+        self.color_button(dim_idx, elem, decision, user=True)
+
+
+    def poll_results(self):
+        """Handle the decisions and results sent by the background search"""
         try:
-            self.user_constraints, self.constraints = self.coroutine.send(self._last_user_input)
-            message = ''
-        except StopIteration as last:
-            self.user_constraints, self.constraints = last.value
-            message = 'FOUND CONCEPT: ' + navigation.pretty_nconcept(self.constraints)
-        self.create_widgets()
-        self.info(message)
+            while True:
+                navigator, kind, result = self.results.get_nowait()
+                if navigator is not self.navigator:
+                    continue  # cancelled search
+                if kind == 'decision':
+                    self.color_button(*result)
+                    continue
+                if kind == 'rejected':  # the step that follows restores the previous state
+                    self.err('No concept meets this choice, it is cancelled')
+                    continue
+                self.running = False
+                if kind == 'error':
+                    # the navigator is over: next choice starts a new one from the shown state
+                    self.finished = True
+                    self.pending_constraints = _copied(self.user_constraints)
+                    self.show_constraints(self.user_constraints, self.constraints)
+                    self.err(result)
+                    continue
+                self.user_constraints, self.constraints = result
+                self.pending_constraints = _copied(self.user_constraints)
+                self.show_constraints(self.user_constraints, self.constraints)
+                self.finished = kind == 'found'
+                if self.finished:
+                    self.log('FOUND CONCEPT: ' + navigation.pretty_nconcept(self.constraints))
+        except queue.Empty:
+            pass
+        self.after(POLL_DELAY, self.poll_results)
+
+
+    def color_button(self, dim_idx:int, elem:str, decision:str, user:bool=False):
+        """Color the button of given element according to given decision"""
+        if decision == 'in':
+            self.set_color(dim_idx, elem, 'green' if user else 'light green')
+        elif decision == 'out':
+            self.set_color(dim_idx, elem, 'red' if user else 'pink')
+        else:
+            self.set_color(dim_idx, elem, NO_COLOR)
+
+    def set_color(self, dim_idx:int, elem:str, color:str):
+        """Remember the color of given element, and recolor its button if shown"""
+        if color == NO_COLOR:
+            self.colors[dim_idx].pop(elem, None)
+        else:
+            self.colors[dim_idx][elem] = color
+        self.views[dim_idx].recolor(elem)
+
+
+def _copied(constraints:dict) -> dict:
+    """Return a copy of given constraints"""
+    return {idx: (set(required), set(forbidden))
+            for idx, (required, forbidden) in constraints.items()}
 
 
 if __name__ == '__main__':
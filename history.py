@@ -0,0 +1,125 @@
+"""History of the states of a navigation, for undo, redo and goto.
+
+A state is the user constraints and the constraints induced from them.
+States are stored frozen, once per distinct user constraints, and their
+sets are interned, so states differing by one element share all their
+other sets. The history is bounded both in number of states and in
+number of elements stored.
+
+Returned states share the stored frozensets, so undo, redo and goto
+don't copy the elements: a dimension must be copied before being modified.
+
+"""
+
+
+import threading
+
+from cache import freeze_constraints
+
+
+class History:
+    """Linear history of navigation states with a cursor on the current one.
+
+    Recording a state after an undo forgets the undone states, like
+    in text editors. Once a bound is exceeded, the oldest states are
+    forgotten. Instances can be shared by threads.
+
+    """
+
+    def __init__(self, max_states:int=100, max_elements:int=1000000):
+        self.max_states = max_states
+        self.max_elements = max_elements
+        self.states = []  # frozen user constraints, from the oldest to the newest
+        self.cursor = -1  # index of the current state in states
+        self.snapshots = {}  # frozen user constraints -> [interned user constraints,
+                             #  frozen induced, number of occurrences in states]
+        self.sets = {}  # frozenset -> [the interned frozenset, number of uses in snapshots]
+        self.size = 0  # number of elements in interned sets
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+
+    def record(self, constraints:dict, induced:dict):
+        """Make given state the current one, after the current state"""
+        with self.lock:
+            key = freeze_constraints(constraints)
+            if self.states and self.states[self.cursor] == key:
+                return  # already the current state
+            for forgotten in self.states[self.cursor+1:]:
+                self._release(forgotten)
+            del self.states[self.cursor+1:]
+            if key in self.snapshots:
+                self.snapshots[key][2] += 1
+                key = self.snapshots[key][0]
+            else:
+                key = tuple((self._intern(required), self._intern(forbidden)) for required, forbidden in key)
+                frozen = tuple((self._intern(required), self._intern(forbidden))
+                               for required, forbidden in freeze_constraints(induced))
+                self.snapshots[key] = [key, frozen, 1]
+            self.states.append(key)
+            self.cursor = len(self.states) - 1
+            while len(self.states) > 1 and (len(self.states) > self.max_states
+                                            or self.size > self.max_elements):
+                self._release(self.states.pop(0))
+                self.cursor -= 1
+
+    def induced(self, constraints:dict) -> dict or None:
+        """Return the induced constraints recorded for given user constraints,
+        or None if unknown."""
+        with self.lock:
+            snapshot = self.snapshots.get(freeze_constraints(constraints))
+            return None if snapshot is None else _constraints(snapshot[1])
+
+
+    def current(self) -> (dict, dict) or None:
+        """Return the current (user constraints, induced constraints), or None if empty"""
+        return self.goto(self.cursor)
+
+    def undo(self) -> (dict, dict) or None:
+        """Return the state before the current one, which becomes current,
+        or None if there is none."""
+        return self.goto(self.cursor - 1) if self.cursor > 0 else None
+
+    def redo(self) -> (dict, dict) or None:
+        """Return the state after the current one, which becomes current,
+        or None if there is none."""
+        return self.goto(self.cursor + 1) if self.cursor + 1 < len(self.states) else None
+
+    def goto(self, position:int) -> (dict, dict) or None:
+        """Return the state at given position, from 0 for the oldest,
+        which becomes current, or None if there is none."""
+        with self.lock:
+            if position not in range(len(self.states)):
+                return None
+            self.cursor = position
+            key = self.states[position]
+            return _constraints(key), _constraints(self.snapshots[key][1])
+
+
+    def _intern(self, elements:frozenset) -> frozenset:
+        """Return the stored frozenset equal to given one, storing it if needed"""
+        if elements in self.sets:
+            self.sets[elements][1] += 1
+        else:
+            self.sets[elements] = [elements, 1]
+            self.size += len(elements)
+        return self.sets[elements][0]
+
+    def _release(self, key:tuple):
+        """Forget one occurrence of given state, and its sets once unused"""
+        self.snapshots[key][2] -= 1
+        if self.snapshots[key][2]:
+            return
+        _, frozen, _ = self.snapshots.pop(key)
+        for elements in (elements for pair in key + frozen for elements in pair):
+            self.sets[elements][1] -= 1
+            if not self.sets[elements][1]:
+                del self.sets[elements]
+                self.size -= len(elements)
+
+
+def _constraints(frozen:tuple) -> dict:
+    """Return the constraints dict of given frozen ones, sharing their frozensets"""
+    return {idx: pair for idx, pair in enumerate(frozen)}
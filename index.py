@@ -0,0 +1,157 @@
+"""Precomputed index of all the concepts of a context, allowing navigation
+without any solver call.
+
+Concepts are enumerated once, numbered, and each (dimension idx, element)
+is mapped to the bitset of the concepts containing it.
+Concept existence and propagation are then bitset intersections:
+
+    python3 index.py data.lp data.idx.npz
+
+"""
+
+
+import json
+import argparse
+
+import numpy
+
+import loaders
+import nconcept
+
+
+class ConceptIndex:
+    """Inverted index from (dimension idx, element) to the bitset,
+    as an integer, of the ids of concepts containing the element.
+
+    """
+
+    def __init__(self, labels:tuple, postings:dict, nb_concept:int, fingerprint:str):
+        self.labels = tuple(frozenset(dim) for dim in labels)
+        self.postings = postings
+        self.nb_concept = nb_concept
+        self.all = (1 << nb_concept) - 1
+        self.fingerprint = fingerprint
+
+
+    @staticmethod
+    def build(context, pivots:int=0, processes:int=None):
+        """Return the index of given context, enumerating its concepts
+        in parallel if pivots are given (see nconcept.partition).
+
+        """
+        if pivots:
+            concepts = nconcept.iter_concepts_in_parallel(context, pivots, processes)
+        else:
+            concepts = nconcept.iter_concepts(context)
+        ids = {}  # (dimension idx, element) -> [concept id]
+        nb_concept = 0
+        for concept_id, concept in enumerate(concepts):
+            nb_concept += 1
+            for idx, dim in enumerate(concept):
+                for elem in dim:
+                    ids.setdefault((idx, elem), []).append(concept_id)
+        postings = {key: _bitset(concept_ids, nb_concept) for key, concept_ids in ids.items()}
+        return ConceptIndex(context.sets, postings, nb_concept, context.fingerprint())
+
+
+    def concepts(self, constraints) -> int:
+        """Return the bitset of concepts meeting given constraints.
+        Elements absent from the context are ignored."""
+        concepts = self.all
+        for idx, (required, forbidden) in constraints.items():
+            for elem in required:
+                if elem in self.labels[idx]:
+                    concepts &= self.postings.get((idx, elem), 0)
+            for elem in forbidden:
+                concepts &= ~self.postings.get((idx, elem), 0)
+        return concepts
+
+    def count(self, constraints) -> int:
+        """Return the number of concepts meeting given constraints"""
+        return bin(self.concepts(constraints)).count('1')
+
+
+    def have_concept(self, context, constraints) -> bool:
+        """True if given constraints allows existance of at least one concept
+        in the indexed context.
+
+        Same signature as nconcept.have_concept.
+
+        """
+        nconcept.STATS.add(calls=1)
+        return bool(self.concepts(constraints))
+
+    def propagate(self, context, constraints:dict, on_decision=None) -> dict:
+        """Return the same as navigation.propagate(): elements of no remaining
+        concept are forbidden, elements of all remaining concepts are required.
+
+        """
+        nconcept.STATS.add(calls=1, rounds=1)
+        remaining = self.concepts(constraints)
+        propagated = {dim: (set(val[0]), set(val[1]))
+                      for dim, val in constraints.items()}
+        for idx, dim in enumerate(context.sets):
+            required, forbidden = propagated[idx]
+            for elem in dim - (required | forbidden):
+                concepts = self.postings.get((idx, elem), 0)
+                if not remaining & concepts:
+                    forbidden.add(elem)
+                    if on_decision: on_decision(idx, elem, 'out')
+                elif not remaining & ~concepts:
+                    required.add(elem)
+                    if on_decision: on_decision(idx, elem, 'in')
+        return propagated
+
+
+    def save(self, path:str):
+        """Write the index in given numpy .npz file"""
+        keys = sorted(self.postings, key=repr)
+        size = (self.nb_concept + 7) // 8
+        bits = numpy.zeros((len(keys), size), dtype=numpy.uint8)
+        for row, key in enumerate(keys):
+            bits[row] = numpy.frombuffer(self.postings[key].to_bytes(size, 'little'), dtype=numpy.uint8)
+        header = {'labels': [sorted(dim) for dim in self.labels], 'keys': keys,
+                  'nb_concept': self.nb_concept, 'fingerprint': self.fingerprint}
+        numpy.savez_compressed(path, header=numpy.array(json.dumps(header)), bits=bits)
+
+    @staticmethod
+    def load(path:str, context=None):
+        """Return the index written in given file. If a context is given,
+        check that the index was built for it.
+
+        """
+        with numpy.load(path) as data:
+            header = json.loads(str(data['header']))
+            bits = data['bits']
+        if context is not None and context.fingerprint() != header['fingerprint']:
+            raise ValueError("Index {} was not built for given context".format(path))
+        postings = {tuple(key): int.from_bytes(row.tobytes(), 'little')
+                    for key, row in zip(header['keys'], bits)}
+        return ConceptIndex(header['labels'], postings, header['nb_concept'], header['fingerprint'])
+
+
+def _bitset(ids:list, size:int) -> int:
+    """Return the integer with given bits set"""
+    bits = numpy.zeros(size, dtype=bool)
+    bits[ids] = True
+    return int.from_bytes(numpy.packbits(bits, bitorder='little').tobytes(), 'little')
+
+
+def cli():
+    parser = argparse.ArgumentParser(description='Build the concept index of a context.')
+    parser.add_argument('context', help='context file, see loaders.py for formats')
+    parser.add_argument('index', help='index file to write')
+    parser.add_argument('--input-format', default=None)
+    parser.add_argument('--pivots', type=int, default=0,
+                        help='split the enumeration in pivots+1 parts, enumerated in parallel')
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    context = loaders.load(args.context, args.input_format)
+    index = ConceptIndex.build(context, args.pivots, args.jobs)
+    index.save(args.index)
+    print('{} concepts indexed in {}'.format(index.nb_concept, args.index))
+
+
+if __name__ == "__main__":
+    cli()
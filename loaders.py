@@ -0,0 +1,227 @@
+"""Reading and writing of contexts from files.
+
+Supported formats:
+
+    incidence -- CSV/TSV file with one relation per line, one element per dimension
+    crosstable -- CSV/TSV dyadic cross table, header line giving the attributes,
+                  and each other line an object followed by its cells
+    facts -- ASP facts set(I,X) and rel(X1,...,Xn), as used in data.lp
+    binary -- packed bit matrix, memory-mapped when read
+
+Text formats are read line by line, the binary one is mapped
+in memory, so opening it is instant and its pages are shared
+by all processes reading the same file.
+
+"""
+
+
+import csv
+import json
+import struct
+import itertools
+from array import array
+
+import numpy
+
+from context import Context, ArrayContext
+
+
+BINARY_MAGIC = b'NAVICEPT'
+BINARY_VERSION = 1
+CROSS_MARKS = {'1', 'x', 'X', '×', 'true', 'True'}
+FORMATS = {'.csv': 'incidence', '.tsv': 'incidence', '.lp': 'facts', '.nvc': 'binary'}
+
+
+def load(path:str, format:str=None, **kwargs) -> ArrayContext:
+    """Return the context found in given file, which format
+    is given or guessed from the extension.
+
+    """
+    if format is None:
+        format = next((fmt for ext, fmt in FORMATS.items() if path.endswith(ext)), None)
+        if format is None:
+            raise ValueError("Can't guess format of {}".format(path))
+        if format in {'incidence', 'crosstable'} and 'delimiter' not in kwargs:
+            kwargs['delimiter'] = '\t' if path.endswith('.tsv') else ','
+    reader = {'incidence': read_incidence, 'crosstable': read_crosstable,
+              'facts': read_facts, 'binary': read_binary}[format]
+    return reader(path, **kwargs)
+
+
+def read_incidence(path:str, delimiter:str=',', storage:str='sparse') -> ArrayContext:
+    """Return the context described by given incidence list,
+    with one relation per line.
+
+    """
+    with open(path, newline='') as fd:
+        rows = (row for row in csv.reader(fd, delimiter=delimiter) if row)
+        return _from_relations(rows, storage)
+
+
+def read_crosstable(path:str, delimiter:str=',', storage:str='packed') -> ArrayContext:
+    """Return the dyadic context described by given cross table"""
+    with open(path, newline='') as fd:
+        rows = csv.reader(fd, delimiter=delimiter)
+        attributes = next(rows)[1:]
+        objects, coordinates = [], array('q')
+        for row in rows:
+            if not row:
+                continue
+            for attr_idx, cell in enumerate(row[1:]):
+                if cell.strip() in CROSS_MARKS:
+                    coordinates.extend((len(objects), attr_idx))
+            objects.append(row[0])
+    return ArrayContext.from_coordinates((objects, attributes), coordinates, storage)
+
+
+def read_facts(path:str, storage:str='sparse') -> ArrayContext:
+    """Return the context described by given ASP facts.
+
+    Pools like set(1,(a;b)) are expanded. Atoms other than set/2
+    and rel/n are ignored.
+
+    """
+    declared = {}  # dimension index -> [elements]
+    def relations():
+        with open(path) as fd:
+            for name, args in _facts(fd):
+                if name == 'set' and len(args) == 2:
+                    declared.setdefault(int(args[0]), []).append(args[1])
+                elif name == 'rel':
+                    yield args
+    labels, coordinates = _intern(relations())
+    # add elements that are declared but not related to anything
+    for dim_idx, elems in declared.items():
+        while len(labels) < dim_idx:
+            labels.append({})
+        for elem in elems:
+            labels[dim_idx-1].setdefault(elem, len(labels[dim_idx-1]))
+    if not labels:
+        raise ValueError("No context found in {}".format(path))
+    return ArrayContext.from_coordinates(tuple(map(tuple, labels)), coordinates, storage)
+
+
+def read_binary(path:str) -> ArrayContext:
+    """Return the context found in given binary file, with the incidence
+    memory-mapped (read only) and packed storage.
+
+    """
+    with open(path, 'rb') as fd:
+        magic, version, ndim = struct.unpack('<8sII', fd.read(16))
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError("{} is not a navicept binary context".format(path))
+        shape = struct.unpack('<{}Q'.format(ndim), fd.read(8 * ndim))
+        labels_size, = struct.unpack('<Q', fd.read(8))
+        labels = json.loads(fd.read(labels_size).decode())
+        offset = fd.tell()
+    size = (int(numpy.prod(shape)) + 7) // 8
+    incidence = numpy.memmap(path, dtype=numpy.uint8, mode='r', offset=offset, shape=(size,))
+    assert tuple(map(len, labels)) == tuple(shape)
+    return ArrayContext(labels, incidence, 'packed')
+
+
+def write_binary(context:Context or ArrayContext, path:str):
+    """Write given context in given file, in the format read by read_binary"""
+    if not isinstance(context, ArrayContext):
+        context = ArrayContext.from_context(context)
+    labels = json.dumps(context.labels).encode()
+    with open(path, 'wb') as fd:
+        fd.write(struct.pack('<8sII', BINARY_MAGIC, BINARY_VERSION, len(context.shape)))
+        fd.write(struct.pack('<{}Q'.format(len(context.shape)), *context.shape))
+        fd.write(struct.pack('<Q', len(labels)))
+        fd.write(labels)
+        fd.write(context.with_storage('packed').incidence.tobytes())
+
+
+def _from_relations(relations:iter, storage:str) -> ArrayContext:
+    """Return the context made of given relations, elements being
+    the ones found in relations."""
+    labels, coordinates = _intern(relations)
+    return ArrayContext.from_coordinates(tuple(map(tuple, labels)), coordinates, storage)
+
+
+def _intern(relations:iter) -> (list, array):
+    """Return the {label: id} mapping of each dimension, and the flat
+    array of ids of given relations."""
+    labels, coordinates = [], array('q')
+    for relation in relations:
+        if not labels:
+            labels = [{} for _ in relation]
+        if len(relation) != len(labels):
+            raise ValueError("Relation {} has not {} elements".format(relation, len(labels)))
+        for dim, elem in zip(labels, relation):
+            coordinates.append(dim.setdefault(elem, len(dim)))
+    return labels, coordinates
+
+
+def _facts(lines:iter) -> iter:
+    """Yield (name, args) of each fact found in given ASP lines,
+    expanding pools."""
+    statement = ''
+    for line in lines:
+        statement += _without_comment(line)
+        *complete, statement = _split_statements(statement)
+        for fact in complete:
+            fact = fact.strip()
+            if '(' not in fact or ':-' in fact:
+                continue
+            name, args = fact.split('(', 1)
+            for expanded in itertools.product(*_arguments(args[:args.rindex(')')])):
+                yield name.strip(), expanded
+
+
+def _without_comment(line:str) -> str:
+    """Return given ASP line without its comment, if any"""
+    in_string = False
+    for idx, char in enumerate(line):
+        if char == '"':
+            in_string = not in_string
+        elif char == '%' and not in_string:
+            return line[:idx] + '\n'
+    return line
+
+
+def _split_statements(text:str) -> list:
+    """Return given text splitted on the dots ending a statement.
+    The last item is the unfinished statement."""
+    statements, current, depth, in_string = [], '', 0, False
+    for char in text:
+        if char == '"':
+            in_string = not in_string
+        elif not in_string and char in '()':
+            depth += 1 if char == '(' else -1
+        elif not in_string and not depth and char == '.':
+            statements.append(current)
+            current = ''
+            continue
+        current += char
+    return statements + [current]
+
+
+def _arguments(text:str) -> list:
+    """Return, for each comma-separated argument of given text, the list
+    of its values (many if the argument is a pool)."""
+    args, current, depth, in_string = [], '', 0, False
+    for char in text + ',':
+        if char == '"':
+            in_string = not in_string
+        elif not in_string and char in '()':
+            depth += 1 if char == '(' else -1
+        elif not in_string and not depth and char == ',':
+            args.append(current.strip())
+            current = ''
+            continue
+        current += char
+    return [[_label(value) for value in _pool(arg)] for arg in args]
+
+
+def _pool(arg:str) -> list:
+    """Return the values of given argument, expanding (a;b;c) pools"""
+    if arg.startswith('(') and arg.endswith(')') and ';' in arg:
+        return [value.strip() for value in arg[1:-1].split(';')]
+    return [arg]
+
+
+def _label(value:str) -> str:
+    """Return the element label of given ASP term"""
+    return value[1:-1] if len(value) > 1 and value[0] == value[-1] == '"' else value
@@ -5,24 +5,55 @@ to plug easily user interaction to lattice exploration.
 """
 
 
-from asyncio import coroutine
+import time
+import random
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import repeat
 
 from termcolor import cprint
 
 import nconcept
 from context import Context
+from history import History
 
 
-@coroutine
-def find_concepts_interactively(context):
+HISTORY_COMMANDS = {'undo', 'redo'}
+
+
+def find_concepts_interactively(context, have_concept=None, propagator=None, on_step=None,
+                                on_decision=None, constraints:dict=None, history:History=None,
+                                on_reject=None):
     """Coroutine implementing an interactive n-concept finding algorithm.
 
     Yield (context, constraints) 2-uplet,
-    receive (idx, choosen, decision) 3-uplet.
+    receive (idx, choosen, decision) 3-uplet, or a list of them
+    that are applied together before a single propagation,
+    or a history command: 'undo', 'redo' or ('goto', position).
 
     Parameters:
         context -- the working context (remains unchanged)
+        have_concept -- function (context, constraints) -> bool used for
+                        propagation, like dyadic.have_concept for 2-dimensional
+                        contexts ; default to a nconcept.Session
+        propagator -- function (context, constraints) -> induced constraints,
+                      like propagate_by_consequences ; default to propagate
+                      using have_concept
+        on_step -- function called with the statistics of each step,
+                   as given by step_statistics()
+        on_decision -- function called with (idx, elem, 'in' or 'out') as soon
+                       as the default propagator decides an element,
+                       see iter_propagate() ; with a given propagator, it is
+                       called for each decision once the propagator returns
+        constraints -- initial user constraints, the dict being modified
+                       in-place until a history command ; default to none
+        history -- the History recording the states of the navigation,
+                   possibly shared with previous navigations ; default to a new one
+        on_reject -- function called with the received pick, or list of picks,
+                     when no concept meets the constraints updated with it ;
+                     the pick is then cancelled and the same state yielded again
 
     Received during execution:
         idx -- dimension index in context where is the targeted object
@@ -38,18 +69,73 @@ def find_concepts_interactively(context):
     Return:
         concept -- the only concept remaining meeting all the constraints
 
+    Raise ValueError if no concept meets the initial constraints.
+
     This is basically an encapsulation around (1) constraints initialization,
     (2) search loop stop condition and (3) constraint update.
 
+    A step yields only once its propagation is over: decisions are streamed
+    through on_decision only, and a propagation can't be stopped early
+    from the coroutine, except by having have_concept raise an exception
+    (as gui.Navigator does), which ends the navigation.
+    Clients needing to stop early should use iter_propagate() directly.
+
     """
     dimensions = context.sets
-    constraints = {idx: (set(), set()) for idx in range(len(dimensions))}
-    induced_constraints = propagate(context, constraints)
-
-    while not all_relations_are_decided(context, induced_constraints):
+    start = time.perf_counter()
+    if propagator is None:
+        have_concept = have_concept or nconcept.Session(context).have_concept
+        propagator = partial(propagate, have_concept=have_concept, on_decision=on_decision)
+    elif on_decision:
+        propagator = _reporting(propagator, on_decision)
+    if constraints is None:
+        constraints = {idx: (set(), set()) for idx in range(len(dimensions))}
+    history = History() if history is None else history
+    step, user_pick = 0, None
+    with nconcept.collect_statistics() as stats:
+        induced_constraints = history.induced(constraints)
+        if induced_constraints is None:
+            if any(required or forbidden for required, forbidden in constraints.values()) \
+                    and not (have_concept or nconcept.have_concept)(context, constraints):
+                raise ValueError("No concept meets given constraints")
+            induced_constraints = propagator(context, constraints)
+    history.record(constraints, induced_constraints)
+
+    while True:
+        if on_step:
+            on_step(step_statistics(context, step, user_pick, stats, start, induced_constraints))
+        if all_relations_are_decided(context, induced_constraints):
+            break
         user_pick = (yield constraints, induced_constraints)
-        constraints = update_constraints(constraints, *user_pick)
-        induced_constraints = propagate(context, constraints)
+        step, stats, start = step + 1, nconcept.Statistics(), time.perf_counter()
+        if is_history_command(user_pick):
+            if user_pick == 'undo':
+                state = history.undo()
+            elif user_pick == 'redo':
+                state = history.redo()
+            else:
+                state = history.goto(user_pick[1])
+            if state:
+                constraints, induced_constraints = state
+            continue
+        picks = user_pick if isinstance(user_pick, list) else [user_pick]
+        # only the picked dimensions are copied, the others may be shared with the history
+        previous = {idx: constraints[idx] for idx, _, _ in picks}
+        constraints.update({idx: (set(required), set(forbidden))
+                            for idx, (required, forbidden) in previous.items()})
+        for pick in picks:
+            constraints = update_constraints(constraints, *pick)
+        with nconcept.collect_statistics() as stats:
+            known = history.induced(constraints)
+            if known is None and may_be_unsatisfiable(picks, induced_constraints) \
+                    and not (have_concept or nconcept.have_concept)(context, constraints):
+                constraints.update(previous)  # cancel the pick
+                if on_reject: on_reject(user_pick)
+                continue
+            induced_constraints = (known or
+                                   propagate_change(context, constraints, induced_constraints,
+                                                    user_pick, propagator, have_concept, on_decision))
+        history.record(constraints, induced_constraints)
 
     return constraints, induced_constraints
 
@@ -57,16 +143,55 @@ def find_concepts_interactively(context):
     # for elem in context
     # if induced_constraints[idx][0]
 
-def propagate(data:Context, constraints:dict) -> dict:
+
+def step_statistics(data:Context, step:int, pick:tuple, collected:nconcept.Statistics,
+                    start:float, induced_constraints:dict) -> dict:
+    """Return the statistics of a navigation step: the step number, the user pick,
+    its wall time, the counters of given statistics collected during the step
+    (see nconcept.collect_statistics), and the number of undecided elements left.
+
+    """
+    stats = collected.as_dict()
+    stats.update({
+        'step': step,
+        'pick': pick,
+        'time': time.perf_counter() - start,
+        'undecided': sum(len(dim - (induced_constraints[idx][0] | induced_constraints[idx][1]))
+                         for idx, dim in enumerate(data.sets)),
+    })
+    return stats
+
+def propagate(data:Context, constraints:dict, have_concept=nconcept.have_concept,
+              on_decision=None) -> dict:
     """Return {dimid: {required}, {forbidden}} populated with given
     constraints and any constraint induced from data.
 
+    have_concept is the function (context, constraints) -> bool
+    used to test the existance of a concept.
+    on_decision, if given, is called with (dimid, elem, 'in' or 'out')
+    as soon as an element is decided.
+
     """
     propagated = {dim: (set(val[0]), set(val[1]))
                   for dim, val in constraints.items()}
+    for decision in iter_propagate(data, propagated, have_concept):
+        if on_decision: on_decision(*decision)
+    return propagated
+
+
+def iter_propagate(data:Context, propagated:dict, have_concept=nconcept.have_concept) -> iter:
+    """Yield (dimid, elem, 'in' or 'out') for each constraint induced from data,
+    as soon as it is proven, after adding it in-place to given constraints.
+
+    Once exhausted, propagated holds the same as propagate() output.
+    Client may stop early, for instance once the element it is
+    interested in is decided.
+
+    """
     change = True
     while change:
         change = False
+        nconcept.STATS.add(rounds=1)
         for idx, dim in enumerate(data.sets):
             required, forbidden = propagated[idx]
             for elem in dim - (required | forbidden):
@@ -74,21 +199,253 @@ def propagate(data:Context, constraints:dict) -> dict:
                 # If, once added, elem avoid any concept creation,
                 #  it should be added to forbidden.
                 required.add(elem)
-                if not nconcept.have_concept(data, propagated):
+                if not have_concept(data, propagated):
                     forbidden.add(elem)
                     change = True
                 required.remove(elem)
 
-                if elem in forbidden: continue
+                if elem in forbidden:
+                    yield idx, elem, 'out'
+                    continue
 
                 # If, once deleted, elem avoid any concept creation,
                 #  it should be added to required.
                 forbidden.add(elem)
-                if not nconcept.have_concept(data, propagated):
+                if not have_concept(data, propagated):
                     required.add(elem)
                     change = True
                 forbidden.remove(elem)
+                if elem in required:
+                    yield idx, elem, 'in'
+
+
+def is_history_command(pick) -> bool:
+    """True if given pick received by the navigation is a history command,
+    raising ValueError if it looks like one but is malformed."""
+    if isinstance(pick, str):
+        if pick not in HISTORY_COMMANDS:
+            raise ValueError("Invalid history command {}".format(pick))
+        return True
+    if isinstance(pick, tuple) and pick[:1] == ('goto',):
+        if len(pick) != 2 or not isinstance(pick[1], int):
+            raise ValueError("Invalid history command {}".format(pick))
+        return True
+    return False
+
+
+def check_pick(data:Context, constraints:dict, induced_constraints:dict, pick):
+    """Raise ValueError if given pick, list of picks or history command
+    can't be sent to a navigation over given context, in the state given
+    by its user and induced constraints.
+
+    Only the elements decided by user can be released, and a decision
+    can't contradict the induced constraints, which hold for all
+    remaining concepts.
+
+    """
+    if is_history_command(pick):
+        return
+    for dim, elem, decision in (pick if isinstance(pick, list) else [pick]):
+        if decision not in {'in', 'out', None}:
+            raise ValueError("Decision must be one of 'in', 'out' or null")
+        if not isinstance(dim, int) or dim not in range(len(data.sets)):
+            raise ValueError("No dimension {}".format(dim))
+        if elem not in data.sets[dim]:
+            raise ValueError("No element {} in dimension {}".format(elem, dim))
+        required, forbidden = constraints[dim]
+        if decision is None and elem not in required | forbidden:
+            raise ValueError("Element {} is not decided by user".format(elem))
+        if decision and elem in induced_constraints[dim][1 if decision == 'in' else 0]:
+            raise ValueError("Element {} is known to be {} the concept".format(
+                elem, 'out of' if decision == 'in' else 'in'))
+
+
+def may_be_unsatisfiable(picks:list, induced_constraints:dict) -> bool:
+    """True if no concept may meet the constraints updated with given picks,
+    knowing the constraints induced before them.
+
+    A single decision over an undecided element, or retractions only,
+    always leave a concept ; many decisions together, or a decision
+    contradicting a deduction, may not.
+
+    """
+    decisions = [(idx, elem, decision) for idx, elem, decision in picks if decision]
+    return len(decisions) > 1 or any(elem in induced_constraints[idx][1 if decision == 'in' else 0]
+                                     for idx, elem, decision in decisions)
+
+
+def propagate_change(data:Context, constraints:dict, induced_constraints:dict,
+                     pick:tuple, propagator=propagate, have_concept=None,
+                     on_decision=None) -> dict:
+    """Return induced constraints of given user constraints, already updated
+    with given (idx, item, decision) pick, or list of picks, reusing
+    the induced_constraints computed before the pick.
+
+    Adding a decision only removes concepts, so all previous deductions hold
+    and only the still undecided elements are given to the propagator.
+    Retracting a decision only adds concepts, so undecided elements stay
+    undecided and only the previously decided ones are probed again
+    with have_concept (if not given, the propagator restarts from scratch).
+    A decision contradicting a deduction, or a list mixing decisions
+    and retractions, is propagated from scratch.
+    on_decision is called for the elements decided by these probes.
+
+    """
+    picks = pick if isinstance(pick, list) else [pick]
+    previous = {dim: (set(val[0]), set(val[1]))
+                for dim, val in induced_constraints.items()}
+    if all(decision for _, _, decision in picks) and not any(
+            constraints[idx][0] & forbidden or constraints[idx][1] & required
+            for idx, (required, forbidden) in induced_constraints.items()):
+        new = False
+        for idx, (required, forbidden) in previous.items():
+            new = new or not (constraints[idx][0] <= required and constraints[idx][1] <= forbidden)
+            required |= constraints[idx][0]
+            forbidden |= constraints[idx][1]
+        return propagator(data, previous) if new else previous
+    if all(not decision for _, _, decision in picks) and have_concept:
+        propagated = {dim: (set(val[0]), set(val[1]))
+                      for dim, val in constraints.items()}
+        for dim_idx, (required, forbidden) in previous.items():
+            user_required, user_forbidden = propagated[dim_idx]
+            for elem in (required | forbidden) - (user_required | user_forbidden):
+                decision = probe(data, propagated, dim_idx, elem, have_concept)
+                if decision:
+                    propagated[dim_idx][0 if decision == 'in' else 1].add(elem)
+                    if on_decision: on_decision(dim_idx, elem, decision)
+        return propagated
+    return propagator(data, constraints)
+
+
+def _reporting(propagator, on_decision):
+    """Return given propagator, calling on_decision with each decision it made
+    once it returns."""
+    def reporting(data:Context, constraints:dict) -> dict:
+        induced = propagator(data, constraints)
+        for idx in sorted(induced):
+            required, forbidden = induced[idx]
+            for elem in sorted(required - constraints[idx][0]):
+                on_decision(idx, elem, 'in')
+            for elem in sorted(forbidden - constraints[idx][1]):
+                on_decision(idx, elem, 'out')
+        return induced
+    return reporting
+
+
+def propagate_in_parallel(data:Context, constraints:dict, have_concept=nconcept.have_concept,
+                          executor=None, max_workers:int=None, on_decision=None) -> dict:
+    """Return the same as propagate(), but running the probes of each round
+    in given concurrent.futures executor.
+
+    All undecided elements are probed against the constraints known at the
+    beginning of the round, and their results merged in a fixed order
+    before the next round starts.
+    If no executor is given, a thread pool of max_workers threads is used
+    during the call. A process pool needs have_concept to be picklable,
+    which is the case of nconcept.have_concept but not of a Session.
+
+    """
+    propagated = {dim: (set(val[0]), set(val[1]))
+                  for dim, val in constraints.items()}
+    with (ThreadPoolExecutor(max_workers) if executor is None else nullcontext(executor)) as pool:
+        change = True
+        while change:
+            change = False
+            nconcept.STATS.add(rounds=1)
+            undecided = tuple((idx, elem) for idx, dim in enumerate(data.sets)
+                              for elem in sorted(dim - (propagated[idx][0] | propagated[idx][1])))
+            snapshot = {idx: (frozenset(required), frozenset(forbidden))
+                        for idx, (required, forbidden) in propagated.items()}
+            # threads give their statistics to the ones collected by the caller
+            probing = nconcept.collecting(probe) if isinstance(pool, ThreadPoolExecutor) else probe
+            decisions = pool.map(probing, repeat(data), repeat(snapshot),
+                                 (idx for idx, _ in undecided),
+                                 (elem for _, elem in undecided),
+                                 repeat(have_concept))
+            for (idx, elem), decision in zip(undecided, decisions):
+                if decision:
+                    propagated[idx][0 if decision == 'in' else 1].add(elem)
+                    change = True
+                    if on_decision: on_decision(idx, elem, decision)
+    return propagated
+
+
+def propagate_batched(data:Context, constraints:dict, have_concepts=nconcept.have_concepts,
+                      on_decision=None) -> dict:
+    """Return the same as propagate(), but sending all the probes of a round
+    to a single call of have_concepts, the function (context, [constraints]) -> [bool]
+    answering many existence tests at once.
+
+    As in propagate_in_parallel(), probes are made against the constraints
+    known at the beginning of the round.
+
+    """
+    propagated = {dim: (set(val[0]), set(val[1]))
+                  for dim, val in constraints.items()}
+    change = True
+    while change:
+        change = False
+        nconcept.STATS.add(rounds=1)
+        undecided = tuple((idx, elem) for idx, dim in enumerate(data.sets)
+                          for elem in sorted(dim - (propagated[idx][0] | propagated[idx][1])))
+        queries = []
+        for idx, elem in undecided:
+            required, forbidden = propagated[idx]
+            for tested in ((required | {elem}, forbidden), (required, forbidden | {elem})):
+                queries.append(dict(propagated))
+                queries[-1][idx] = tested
+        answers = iter(have_concepts(data, queries))
+        for (idx, elem), can_be_in, can_be_out in zip(undecided, answers, answers):
+            decision = 'out' if not can_be_in else ('in' if not can_be_out else None)
+            if decision:
+                propagated[idx][0 if decision == 'in' else 1].add(elem)
+                change = True
+                if on_decision: on_decision(idx, elem, decision)
+    return propagated
+
 
+def probe(data:Context, constraints:dict, idx:int, elem, have_concept=nconcept.have_concept) -> str or None:
+    """Return 'out' if given element of dimension idx can't be in any concept
+    meeting given constraints, 'in' if it can't be outside of all of them,
+    or None if both are possible.
+
+    """
+    required, forbidden = constraints[idx]
+    tested_constraints = dict(constraints)
+    tested_constraints[idx] = (required | {elem}, forbidden)
+    if not have_concept(data, tested_constraints):
+        return 'out'
+    tested_constraints[idx] = (required, forbidden | {elem})
+    if not have_concept(data, tested_constraints):
+        return 'in'
+    return None
+
+
+def propagate_by_consequences(data:Context, constraints:dict, session:nconcept.Session=None,
+                              on_decision=None) -> dict:
+    """Return the same as propagate(), but using at most two solver calls.
+
+    Elements that are in no concept (not in the brave consequences)
+    are forbidden, elements that are in all concepts (in the cautious
+    consequences) are required. If no concept exists at all,
+    all undecided elements are forbidden.
+
+    """
+    session = session or nconcept.Session(data)
+    propagated = {dim: (set(val[0]), set(val[1]))
+                  for dim, val in constraints.items()}
+    nconcept.STATS.add(rounds=1)
+    brave = session.consequences(data, propagated, 'brave')
+    cautious = set() if brave is None else session.consequences(data, propagated, 'cautious')
+    for idx, dim in enumerate(data.sets):
+        required, forbidden = propagated[idx]
+        for elem in dim - (required | forbidden):
+            if brave is None or (idx, elem) not in brave:
+                forbidden.add(elem)
+                if on_decision: on_decision(idx, elem, 'out')
+            elif (idx, elem) in cautious:
+                required.add(elem)
+                if on_decision: on_decision(idx, elem, 'in')
     return propagated
 
 
@@ -101,6 +458,25 @@ def all_relations_are_decided(data:Context, constraints:dict):
     return True
 
 
+def random_constraints(data:Context, rng:random.Random) -> dict:
+    """Return constraints requiring and forbidding at most one element per dimension,
+    as used to sample existence tests."""
+    constraints = {}
+    for idx, dim in enumerate(data.sets):
+        elems = sorted(dim)
+        required = set(rng.sample(elems, rng.randint(0, 1)))
+        constraints[idx] = required, set(rng.sample(elems, rng.randint(0, 1))) - required
+    return constraints
+
+
+def random_pick(constraints:dict, data:Context, rng:random.Random) -> (int, str, str):
+    """Return a random decision over an undecided element"""
+    undecided = [(idx, elem) for idx, dim in enumerate(data.sets)
+                 for elem in sorted(dim - (constraints[idx][0] | constraints[idx][1]))]
+    idx, elem = rng.choice(undecided)
+    return idx, elem, rng.choice(('in', 'out'))
+
+
 def update_constraints(constraints:tuple, dimension, item, update:str or None) -> tuple:
     """Return constraints modified in-place, with given item in given dimension
     that will be marked as *update* (required, forbidden or None)
@@ -22,7 +22,33 @@ Context = namedtuple('Context', 'sets, relations')
 def have_concept(context, constraints) -> bool:
     """True if given context and constraints yields concepts."""
     solver = asp.Gringo4Clasp(clasp_options='-n 1')
+    atoms = asp_atoms(context, constraints)
+    # print(atoms, end='')
+
+    for answer in solver.run(programs=list(ASP_FILES), additionalProgramText=atoms):
+        # print('\tOK')
+        return True
+    # print('\tNOPE')
+    return False
 
+
+def consequences(context, constraints, mode:str) -> set or None:
+    """Return the {(dimension idx, elem)} brave or cautious consequences
+    of in/2 for given context and constraints, or None if no concept exists.
+
+    """
+    assert mode in {'brave', 'cautious'}
+    solver = asp.Gringo4Clasp(clasp_options='-n 0 --enum-mode=' + mode)
+    answers = solver.run(programs=list(ASP_FILES), collapseAtoms=False,
+                         additionalProgramText=asp_atoms(context, constraints))
+    for answer in answers:
+        return {(int(term.args()[0]) - 1, term.args()[1])
+                for term in answer if term.pred() == 'in'}
+    return None
+
+
+def asp_atoms(context, constraints) -> str:
+    """Return the ASP facts encoding given context and constraints."""
     atoms = set()
     for idx, constraint in enumerate(constraints, start=1):
         for elem in constraint.required:
@@ -35,14 +61,7 @@ def have_concept(context, constraints) -> bool:
     for idx, relations in enumerate(context.relations, start=1):
         atoms.add('rel({},{})'.format(*relations))
 
-    atoms = '.'.join(sorted(atoms)) + ('.' if atoms else '')
-    # print(atoms, end='')
-
-    for answer in solver.run(programs=list(ASP_FILES), additionalProgramText=atoms):
-        # print('\tOK')
-        return True
-    # print('\tNOPE')
-    return False
+    return '.'.join(sorted(atoms)) + ('.' if atoms else '')
 
 
 
@@ -78,8 +97,35 @@ def propagate(context, constraints):
     return constraints
 
 
-def find_concepts_interactively(context):
-    """Interactive n-concept finding algorithm"""
+def propagate_by_consequences(context, constraints):
+    """Propagation of client decisions, as propagate() does,
+    using the brave and cautious consequences instead of one probe
+    per element.
+
+    Modify given constraints in place.
+
+    """
+    brave = consequences(context, constraints, 'brave')
+    cautious = set() if brave is None else consequences(context, constraints, 'cautious')
+    for idx, (dim, constraint) in enumerate(zip(context.sets, constraints)):
+        required, forbidden = set(constraint.required), set(constraint.forbidden)
+        for elem in dim - (constraint.required | constraint.forbidden):
+            if brave is None or (idx, elem) not in brave:
+                forbidden.add(elem)
+            elif (idx, elem) in cautious:
+                required.add(elem)
+        constraints[idx] = Constraint(required, forbidden)
+    return constraints
+
+
+def find_concepts_interactively(context, choose=None):
+    """Interactive n-concept finding algorithm.
+
+    choose is the function (context, constraints) -> (idx, elem, decision)
+    giving the next user decision ; default to user_choose_one.
+
+    """
+    choose = choose or user_choose_one
     constraints = [Constraint() for _ in range(len(context.sets))]
     constraints = propagate(context, constraints)
 
@@ -90,7 +136,7 @@ def find_concepts_interactively(context):
 
     while while_stop_condition():
         # choice of an element to take or discards
-        idx, choosen, decision = user_choose_one(context, constraints)
+        idx, choosen, decision = choose(context, constraints)
 
         constraint = constraints[idx]
         if decision == 'in':
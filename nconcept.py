@@ -3,10 +3,35 @@
 """
 
 
-from pyasp import asp
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import contextvars
+import multiprocessing
+from contextlib import contextmanager
+from collections import OrderedDict
+
+import clingo
 
 
 ASP_FILES = {'simple.lp'}
+BATCH_ASP_FILES = {'batch.lp'}
+EXTERNAL_CONSTRAINTS = ('#external required(I,X): set(I,X). [free]'
+                        '#external forbidden(I,X): set(I,X). [free]')
+
+# Number of concepts sent at once by the processes of iter_concepts_in_parallel.
+CHUNK_SIZE = 256
+
+# Version of the files written by write_ground_program, part of their names.
+GROUND_PROGRAM_FORMAT = 'aspif+externals+atoms'
+
+# Solver configurations to use by context shape, as found by tuning.py:
+#  {shape: {'encoding': [ASP files], 'options': [clasp options]}}
+TUNED_CONFIGURATIONS = {}
 
 
 def have_concept(context, constraints) -> bool:
@@ -14,28 +39,513 @@ def have_concept(context, constraints) -> bool:
     in the given context.
 
     """
-    solver = asp.Gringo4Clasp(clasp_options='-n 1')
+    asp_files, options = configuration(context)
 
-    atoms = set()
+    atoms = set(context_atoms(context))
     for idx, dim in enumerate(context.sets):
         required, forbidden = constraints[idx]
         for elem in required:
             atoms.add('required({},"{}")'.format(idx+1, elem))
         for elem in forbidden:
             atoms.add('forbidden({},"{}")'.format(idx+1, elem))
-        for elem in dim:
-            atoms.add('set({},"{}")'.format(idx+1, elem))
-
-    for relations in context.relations:
-        atoms.add('rel("{}")'.format('","'.join(relations)))
 
     asp_constraints = ''.join(dimension_dependant_constraints(len(context.sets)))
     asp_atoms = '.'.join(sorted(atoms)) + ('.' if atoms else '')
+    return solve(asp_files, asp_atoms + asp_constraints, ['-n', '1'] + options) is not None
+
+
+def have_concepts(context, queries:list) -> list:
+    """Return, for each given constraints, the same as have_concept,
+    using a single solver call.
+
+    Queries are numbered and encoded together (see batch.lp), and
+    the satisfiable ones are the brave consequences of sat/1.
+
+    """
+    if not queries:
+        return []
+
+    atoms = set(context_atoms(context))
+    for query, constraints in enumerate(queries):
+        atoms.add('query({})'.format(query))
+        for idx, dim in enumerate(context.sets):
+            required, forbidden = constraints[idx]
+            for elem in required:
+                atoms.add('required({},{},"{}")'.format(query, idx+1, elem))
+            for elem in forbidden:
+                atoms.add('forbidden({},{},"{}")'.format(query, idx+1, elem))
+
+    asp_constraints = ''.join(batched_dimension_dependant_constraints(len(context.sets)))
+    asp_atoms = '.'.join(sorted(atoms)) + '.'
+    # the last model holds the brave consequences
+    consequences = solve(BATCH_ASP_FILES, asp_atoms + asp_constraints,
+                         ['-n', '0', '--enum-mode=brave']) or ()
+    satisfiable = {symbol.arguments[0].number for symbol in consequences}
+    return [query in satisfiable for query in range(len(queries))]
+
+
+def solve(asp_files:set, program:str, options:list) -> list or None:
+    """Return the shown symbols of the last model found by a new solver
+    on given encoding and program, or None if there is none.
+
+    Grounding and solving are timed separately in STATS, which also
+    receives the number of atoms of the ground program.
+
+    """
+    start = time.perf_counter()
+    control = clingo.Control(options, logger=_log_warnings)
+    for asp_file in sorted(asp_files):
+        control.load(asp_file)
+    control.add('base', [], program)
+    control.ground([('base', [])])
+    grounded = time.perf_counter()
+    last_model = None
+    def on_model(model):
+        nonlocal last_model
+        last_model = model.symbols(shown=True)
+    result = control.solve(on_model=on_model)
+    STATS.add(calls=1, grounding_time=grounded - start,
+              solving_time=time.perf_counter() - grounded, atoms=len(control.symbolic_atoms))
+    return last_model if result.satisfiable else None
+
+
+def _log_warnings(code:clingo.MessageCode, message:str):
+    """Print given solver message, unless it is about membership constraints
+    absent from the program, which is expected."""
+    if code != clingo.MessageCode.AtomUndefined:
+        print(message, file=sys.stderr)
+
+
+class Statistics:
+    """Counters of the work done by the solving functions.
+
+    calls -- number of concept existence tests
+    grounding_time, solving_time -- wall time spent in grounding and in solving
+    atoms -- size of the last program grounded, in atoms
+    rounds -- number of propagation rounds until fixpoint
+    cache_hits, cache_misses -- answers found or not in a cache
+
+    Updates are serialized, so threads can share an instance.
+    They are also given to the instances collecting the work of
+    the current thread, see collect_statistics().
+
+    """
+    COUNTERS = ('calls', 'grounding_time', 'solving_time', 'rounds',
+                'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            for counter in self.COUNTERS:
+                setattr(self, counter, 0)
+            self.atoms = 0
+
+    def add(self, atoms:int=None, **counts):
+        """Increment given counters, and set the program size if given"""
+        for stats in (self,) + _COLLECTORS.get():
+            with stats.lock:
+                for counter, value in counts.items():
+                    setattr(stats, counter, getattr(stats, counter) + value)
+                if atoms is not None:
+                    stats.atoms = atoms
+
+    def as_dict(self) -> dict:
+        stats = {counter: getattr(self, counter) for counter in self.COUNTERS}
+        stats['atoms'] = self.atoms
+        return stats
+
+
+# Statistics shared by all solving functions of the process.
+STATS = Statistics()
+
+# Statistics collecting the work of the current thread, see collect_statistics().
+_COLLECTORS = contextvars.ContextVar('collectors', default=())
+
+
+@contextmanager
+def collect_statistics(stats:Statistics=None) -> Statistics:
+    """Context manager giving given Statistics, or a new one, that receives
+    the updates made by the current thread until exit, in addition to STATS.
+
+    Unlike STATS, it doesn't count the work of concurrent sessions,
+    except by functions wrapped with collecting().
+
+    """
+    stats = Statistics() if stats is None else stats
+    token = _COLLECTORS.set(_COLLECTORS.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _COLLECTORS.reset(token)
+
+
+def collecting(function):
+    """Return given function, giving its updates of statistics to the ones
+    collected by the current thread, even when called by another thread."""
+    collectors = _COLLECTORS.get()
+    def collected(*args, **kwargs):
+        token = _COLLECTORS.set(collectors)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _COLLECTORS.reset(token)
+    return collected
+
+
+class Session:
+    """Solver session bound to a context.
+
+    The encoding, the dimension dependant constraints and the context
+    are grounded once, at creation. Membership constraints are then given
+    to the solver as assumptions over the required/2 and forbidden/2
+    external atoms, so each query is only a search.
+    Queries from concurrent threads are serialized.
+
+    If a cache directory is given, the ground program is read from it,
+    or written in it for the next sessions over the same context and encoding.
+    See load_ground_program().
+    Encoding and clasp options default to the configuration tuned
+    for the context shape, if any.
+
+    """
+
+    def __init__(self, context, asp_files:set=None, cache_dir:str=None, options:list=None):
+        self.context = context
+        tuned_files, tuned_options = configuration(context)
+        asp_files = tuned_files if asp_files is None else asp_files
+        options = tuned_options if options is None else list(options)
+        self.control = clingo.Control(['-n', '1'] + options)
+        start = time.perf_counter()
+        if cache_dir is None:
+            add_program(self.control, context, asp_files)
+            self.control.ground([('base', [])])
+            self.externals = {atom.symbol: atom.literal for atom in self.control.symbolic_atoms
+                              if atom.is_external}
+            atoms = len(self.control.symbolic_atoms)
+        else:
+            self.externals, atoms = load_ground_program(self.control, context, asp_files, cache_dir)
+        STATS.add(grounding_time=time.perf_counter() - start, atoms=atoms)
+        self.lock = threading.Lock()
+
+    def have_concept(self, context, constraints) -> bool:
+        """True if given constraints allows existance of at least one concept
+        in the session context.
+
+        Same signature as the module level have_concept, so a session
+        can be used wherever the latter is expected.
+
+        """
+        assert context is self.context, "Session is bound to another context"
+        with self.lock:
+            start = time.perf_counter()
+            satisfiable = self.control.solve(assumptions=list(self.assumptions(constraints))).satisfiable
+        STATS.add(calls=1, solving_time=time.perf_counter() - start)
+        return satisfiable
+
+    def consequences(self, context, constraints, mode:str) -> set or None:
+        """Return the {(dimension idx, elem)} brave or cautious consequences
+        of in/2 under given constraints, or None if there is no concept.
+
+        Brave consequences are the elements present in at least one concept,
+        cautious consequences the elements present in all concepts.
+
+        """
+        assert context is self.context, "Session is bound to another context"
+        assert mode in {'brave', 'cautious'}
+        consequences = None
+        def on_model(model):
+            nonlocal consequences
+            consequences = model.symbols(shown=True)
+        solve_conf = self.control.configuration.solve
+        with self.lock:
+            start = time.perf_counter()
+            solve_conf.enum_mode, solve_conf.models = mode, '0'
+            try:
+                self.control.solve(assumptions=list(self.assumptions(constraints)), on_model=on_model)
+            finally:
+                solve_conf.enum_mode, solve_conf.models = 'auto', '1'
+        STATS.add(calls=1, solving_time=time.perf_counter() - start)
+        if consequences is None:
+            return None
+        return {(atom.arguments[0].number - 1, atom.arguments[1].string)
+                for atom in consequences}
+
+    def iter_concepts(self, context, constraints:dict=None) -> iter:
+        """Yield, as tuples of frozensets, the concepts meeting given constraints,
+        as the solver finds them.
+
+        The session is locked until the generator is exhausted or closed.
+
+        """
+        assert context is self.context, "Session is bound to another context"
+        if constraints is None:
+            constraints = {idx: ((), ()) for idx in range(len(context.sets))}
+        solve_conf = self.control.configuration.solve
+        with self.lock:
+            STATS.add(calls=1)
+            solve_conf.models = '0'
+            try:
+                with self.control.solve(assumptions=list(self.assumptions(constraints)),
+                                        yield_=True) as handle:
+                    for model in handle:
+                        concept = tuple(set() for _ in context.sets)
+                        for atom in model.symbols(shown=True):
+                            concept[atom.arguments[0].number - 1].add(atom.arguments[1].string)
+                        yield tuple(map(frozenset, concept))
+            finally:
+                solve_conf.models = '1'
+
+    def assumptions(self, constraints) -> iter:
+        """Yield the program literals of the assumptions encoding given
+        constraints: the required/2 and forbidden/2 atoms of given constraints
+        are true, all others are false.
+
+        """
+        wanted = set()
+        for idx in range(len(self.context.sets)):
+            required, forbidden = constraints[idx]
+            for elem in required:
+                wanted.add(clingo.Function('required', [clingo.Number(idx+1), clingo.String(elem)]))
+            for elem in forbidden:
+                wanted.add(clingo.Function('forbidden', [clingo.Number(idx+1), clingo.String(elem)]))
+        for atom, literal in self.externals.items():
+            yield literal if atom in wanted else -literal
 
-    answers = solver.run(programs=list(ASP_FILES), additionalProgramText=asp_atoms + asp_constraints)
-    for answer in answers:
-        return True
-    return False
+
+def context_shape(context) -> str:
+    """Return the shape of given context, used to share solver configurations
+    between similar contexts: its arity, the sizes of its dimensions
+    rounded up to a power of two, and its density rounded to a tenth.
+
+    >>> context_shape(({'a', 'b', 'c'}, {'x'}, {'y', 'z'}))
+    '3:4x1x2'
+
+    """
+    sets = getattr(context, 'sets', context)
+    sizes = 'x'.join(str(1 << (len(dim) - 1).bit_length()) if dim else '0' for dim in sets)
+    if not hasattr(context, 'relations'):
+        return '{}:{}'.format(len(sets), sizes)
+    if hasattr(context, 'density'):
+        density = context.density()
+    else:
+        cells = 1
+        for dim in sets:
+            cells *= len(dim)
+        density = len(context.relations) / cells if cells else 0.
+    return '{}:{}:{:.1f}'.format(len(sets), sizes, density)
+
+
+def configuration(context) -> (set, list):
+    """Return the ASP files and clasp options to use for given context:
+    the tuned ones for its shape, or the default ones.
+
+    The shape of the last contexts seen is kept, so repeated calls
+    over the same context don't measure its density again.
+
+    """
+    if TUNED_CONFIGURATIONS:
+        with _SHAPES_LOCK:
+            if id(context) in _SHAPES and _SHAPES[id(context)][0] is context:
+                shape = _SHAPES[id(context)][1]
+            else:
+                shape = context_shape(context)
+                _SHAPES[id(context)] = context, shape  # keeps context, so its id is not reused
+                if len(_SHAPES) > 16:
+                    _SHAPES.popitem(last=False)
+        tuned = TUNED_CONFIGURATIONS.get(shape)
+        if tuned:
+            return set(tuned['encoding']), list(tuned['options'])
+    return ASP_FILES, []
+
+
+# Shapes of the last contexts given to configuration(), by id: id -> (context, shape).
+_SHAPES = OrderedDict()
+_SHAPES_LOCK = threading.Lock()
+
+
+def add_program(control:clingo.Control, context, asp_files:set=ASP_FILES):
+    """Add to given control, in the base program, the encoding and the atoms
+    describing given context, with the membership constraints as externals.
+
+    """
+    for asp_file in sorted(asp_files):
+        control.load(asp_file)
+    atoms = sorted(context_atoms(context))
+    control.add('base', [], '.'.join(atoms) + ('.' if atoms else '')
+                + ''.join(dimension_dependant_constraints(len(context.sets)))
+                + EXTERNAL_CONSTRAINTS)
+
+
+def load_ground_program(control:clingo.Control, context, asp_files:set, cache_dir:str) -> (dict, int):
+    """Load in given control the ground program of given context and encoding
+    found in cache_dir, after writing it there if needed, and return
+    the {external atom: program literal} of membership constraints,
+    and the number of atoms of the program when it was grounded.
+
+    The control only knows the atoms of the loaded program that are
+    shown, so the size is the one recorded by write_ground_program().
+
+    Programs are written in the aspif format, and named after a hash
+    of the context, the encoding and the clingo version, so any change
+    in one of them leads to a new grounding.
+
+    """
+    path = os.path.join(cache_dir, ground_program_key(context, asp_files) + '.aspif')
+    if not os.path.exists(path):
+        write_ground_program(context, asp_files, path)
+    with open(path + '.json') as fd:
+        metadata = json.load(fd)
+    externals = {clingo.Function(name, [clingo.Number(idx), clingo.String(elem)]): literal
+                 for name, idx, elem, literal in metadata['externals']}
+    control.load(path)
+    control.ground([('base', [])])
+    return externals, metadata['atoms']
+
+
+def write_ground_program(context, asp_files:set, path:str):
+    """Write in given path the aspif ground program of given context and
+    encoding, and next to it as JSON its external atoms and number of atoms.
+
+    Files are written under unique temporary names then renamed, so
+    concurrent writers, threads or processes, and readers never see
+    an incomplete program.
+
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    program_fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(program_fd)  # reopened by clingo
+    metadata_fd, temporary_metadata = tempfile.mkstemp(dir=directory, suffix='.json.tmp')
+    try:
+        control = clingo.Control()
+        add_program(control, context, asp_files)
+        control.register_backend(clingo.BackendType.Aspif, temporary, True)
+        control.ground([('base', [])])
+        externals = [(atom.symbol.name, atom.symbol.arguments[0].number,
+                      atom.symbol.arguments[1].string, atom.literal)
+                     for atom in control.symbolic_atoms if atom.is_external]
+        atoms = len(control.symbolic_atoms)
+        control.solve()  # the backend replaces the solver, and writes the program
+        del control
+        with os.fdopen(metadata_fd, 'w') as fd:
+            json.dump({'externals': externals, 'atoms': atoms}, fd)
+        os.replace(temporary_metadata, path + '.json')
+        os.replace(temporary, path)
+    finally:
+        for leftover in (temporary, temporary_metadata):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def ground_program_key(context, asp_files:set) -> str:
+    """Return the hash identifying the ground program of given context and encoding"""
+    content = hashlib.sha1()
+    content.update(GROUND_PROGRAM_FORMAT.encode())
+    content.update(clingo.__version__.encode())
+    content.update(context.fingerprint().encode())
+    for asp_file in sorted(asp_files):
+        with open(asp_file, 'rb') as fd:
+            content.update(fd.read())
+    content.update(''.join(dimension_dependant_constraints(len(context.sets))).encode())
+    content.update(EXTERNAL_CONSTRAINTS.encode())
+    return content.hexdigest()
+
+
+def iter_concepts(context, constraints:dict=None) -> iter:
+    """Yield, as tuples of frozensets, the concepts of given context meeting
+    given constraints, without keeping them in memory.
+
+    """
+    yield from Session(context).iter_concepts(context, constraints)
+
+
+def partition(context, pivots:int) -> list:
+    """Return constraints splitting the concepts of given context
+    in pivots+1 disjoint parts, using as pivots the first elements
+    of the first dimension.
+
+    The i-th part requires the i-th pivot and forbids the previous ones,
+    the last part forbids all pivots.
+
+    >>> [(sorted(required), sorted(forbidden))
+    ...  for required, forbidden in (part[0] for part in partition(({'c', 'a', 'b'}, {'x'}), 2))]
+    [(['a'], []), (['b'], ['a']), ([], ['a', 'b'])]
+
+    """
+    sets = getattr(context, 'sets', context)
+    pivots = sorted(sets[0])[:pivots]
+    parts = []
+    for idx in range(len(pivots) + 1):
+        constraints = {dim: (set(), set()) for dim in range(len(sets))}
+        constraints[0] = set(pivots[idx:idx+1]), set(pivots[:idx])
+        parts.append(constraints)
+    return parts
+
+
+def iter_concepts_in_parallel(context, pivots:int, processes:int=None,
+                              chunk_size:int=CHUNK_SIZE) -> iter:
+    """Yield the concepts of given context, enumerated by a pool of processes,
+    each one handling a part of the partition with given number of pivots.
+
+    Concepts are sent back by chunks of chunk_size as they are found,
+    through a queue holding a few chunks per process, so memory stays
+    bounded whatever the size of the parts.
+    The context is given once to each process when it starts (inherited
+    without copy when processes are forked, so the pages of a memory-mapped
+    context are shared), and each task receives only the constraints of a part.
+
+    """
+    processes = processes or os.cpu_count()
+    chunks = multiprocessing.Queue(2 * processes)
+    parts = partition(context, pivots)
+    with multiprocessing.Pool(processes, _set_worker_state, (chunks, context, chunk_size)) as pool:
+        done = pool.map_async(_send_concepts_of_part, parts)
+        remaining = len(parts)
+        while remaining:
+            chunk = chunks.get()
+            if chunk is None:  # a part is over
+                remaining -= 1
+            else:
+                yield from chunk
+        done.get()  # raise the error of a failed part
+
+
+# Queue receiving the chunks of concepts, context enumerated and chunk size,
+#  in the processes of iter_concepts_in_parallel.
+_CHUNKS, _CONTEXT, _CHUNK_SIZE = None, None, CHUNK_SIZE
+
+
+def _set_worker_state(chunks:multiprocessing.Queue, context, chunk_size:int):
+    global _CHUNKS, _CONTEXT, _CHUNK_SIZE
+    _CHUNKS, _CONTEXT, _CHUNK_SIZE = chunks, context, chunk_size
+
+
+def _send_concepts_of_part(constraints:dict):
+    """Send in the chunk queue the concepts of the process context meeting
+    given constraints, by chunks, then None once the part is over."""
+    try:
+        chunk = []
+        for concept in iter_concepts(_CONTEXT, constraints):
+            chunk.append(concept)
+            if len(chunk) >= _CHUNK_SIZE:
+                _CHUNKS.put(chunk)
+                chunk = []
+        if chunk:
+            _CHUNKS.put(chunk)
+    finally:
+        _CHUNKS.put(None)
+
+
+def context_atoms(context) -> iter:
+    """Yield ASP atoms describing given context"""
+    for idx, dim in enumerate(context.sets):
+        for elem in dim:
+            yield 'set({},"{}")'.format(idx+1, elem)
+    for relations in context.iter_relations():
+        yield 'rel("{}")'.format('","'.join(relations))
 
 
 def dimension_dependant_constraints(nb_dimension:int) -> str:
@@ -60,3 +570,15 @@ def dimension_dependant_constraints(nb_dimension:int) -> str:
             xdims=','.join('X'+str(dim) for dim in dimensions),
             in_atoms=in_atoms,
         )
+
+
+def batched_dimension_dependant_constraints(nb_dimension:int) -> str:
+    """Yield the same ASP constraints as dimension_dependant_constraints,
+    for the query-indexed atoms of batch.lp.
+
+    >>> next(batched_dimension_dependant_constraints(2))
+    'out(Q,1,X1):- set(1,X1) ; in(Q,2,X2) ; not rel(X1,X2).'
+
+    """
+    for constraint in dimension_dependant_constraints(nb_dimension):
+        yield constraint.replace('out(', 'out(Q,').replace('in(', 'in(Q,')
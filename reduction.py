@@ -0,0 +1,139 @@
+"""Clarification of contexts, for navigation over smaller contexts.
+
+Two elements of a dimension related to exactly the same tuples of the
+other dimensions belong to the same concepts: the clarified context
+keeps only one representative of each such class, and has the same
+concepts, up to the replacement of representatives by their class.
+
+Reducible elements, whose relations are the intersection of the ones of
+other elements, are kept: such an element belongs to a concept iff all the
+others do, so forbidding it would need a disjunction of forbidden elements,
+which membership constraints can't express.
+
+"""
+
+
+import navigation
+from context import Context
+
+
+class Reduction:
+    """Clarification of a context, with the translation of constraints
+    between the original context and the clarified one.
+
+    original -- the given context
+    context -- the clarified context, over the representatives
+    representatives -- for each dimension, {element: its representative}
+    classes -- for each dimension, {representative: frozenset of its class}
+
+    """
+
+    def __init__(self, context):
+        self.original = context
+        nb_dimension = len(context.sets)
+        slices = tuple({elem: set() for elem in dim} for dim in context.sets)
+        for relation in context.iter_relations():
+            for idx, elem in enumerate(relation):
+                slices[idx][elem].add(relation[:idx] + relation[idx+1:])
+        self.classes = []
+        self.representatives = []
+        for idx in range(nb_dimension):
+            members = {}  # slice -> [elements]
+            for elem, related in slices[idx].items():
+                members.setdefault(frozenset(related), []).append(elem)
+            self.classes.append({min(elems): frozenset(elems) for elems in members.values()})
+            self.representatives.append({elem: representative
+                                         for representative, elems in self.classes[-1].items()
+                                         for elem in elems})
+        self.classes, self.representatives = tuple(self.classes), tuple(self.representatives)
+        self.context = Context(
+            tuple(set(classes) for classes in self.classes),
+            frozenset(tuple(self.representatives[idx][elem] for idx, elem in enumerate(relation))
+                      for relation in context.iter_relations()),
+        )
+
+
+    def reduce_constraints(self, constraints:dict) -> dict:
+        """Return given constraints over the original context translated
+        to the clarified one: a representative is required (forbidden)
+        if an element of its class is.
+
+        """
+        return {idx: ({self.representatives[idx][elem] for elem in required
+                       if elem in self.representatives[idx]},
+                      {self.representatives[idx][elem] for elem in forbidden
+                       if elem in self.representatives[idx]})
+                for idx, (required, forbidden) in constraints.items()}
+
+    def reduce_pick(self, pick):
+        """Return given pick, list of picks or history command received
+        by the navigation coroutine, over the clarified context."""
+        if navigation.is_history_command(pick):
+            return pick
+        if isinstance(pick, list):
+            return list(map(self.reduce_pick, pick))
+        idx, elem, decision = pick
+        return idx, self.representatives[idx][elem], decision
+
+    def expand_constraints(self, constraints:dict) -> dict:
+        """Return given constraints over the clarified context translated
+        to the original one: each representative is replaced by its class.
+
+        """
+        return {idx: (self.expand(idx, required), self.expand(idx, forbidden))
+                for idx, (required, forbidden) in constraints.items()}
+
+    def expand_concept(self, concept:tuple) -> tuple:
+        """Return the concept of the original context corresponding
+        to given concept of the clarified one."""
+        return tuple(frozenset(self.expand(idx, dim)) for idx, dim in enumerate(concept))
+
+    def expand(self, idx:int, representatives:iter) -> set:
+        """Return the union of the classes of given representatives of dimension idx"""
+        return {elem for representative in representatives
+                for elem in self.classes[idx][representative]}
+
+
+    def ratio(self) -> float:
+        """Return the size of the clarified context relatively to the original,
+        as the ratio of their number of cells."""
+        original = reduced = 1
+        for dim, classes in zip(self.original.sets, self.classes):
+            original, reduced = original * len(dim), reduced * len(classes)
+        return reduced / original if original else 1.
+
+
+def find_concepts_interactively(context, reduction:Reduction=None, constraints:dict=None,
+                                on_decision=None, **kwargs):
+    """Same as navigation.find_concepts_interactively, but navigating
+    over the clarified context.
+
+    Yielded and returned constraints, as well as the decisions given to
+    on_decision, are over the original context. A pick on an element
+    applies to its whole class, since they belong to the same concepts.
+    Lists of picks and history commands are received as in navigation.
+    Other parameters are given to navigation.find_concepts_interactively,
+    so have_concept and propagator must handle the clarified context,
+    available as reduction.context.
+
+    """
+    reduction = reduction or Reduction(context)
+    if constraints is not None:
+        constraints = reduction.reduce_constraints(constraints)
+    if on_decision:
+        def on_reduced_decision(idx, representative, decision):
+            for elem in sorted(reduction.classes[idx][representative]):
+                on_decision(idx, elem, decision)
+        kwargs['on_decision'] = on_reduced_decision
+    reduced = navigation.find_concepts_interactively(
+        reduction.context, constraints=constraints, **kwargs
+    )
+    try:
+        constraints, induced = next(reduced)
+        while True:
+            pick = yield (reduction.expand_constraints(constraints),
+                          reduction.expand_constraints(induced))
+            constraints, induced = reduced.send(reduction.reduce_pick(pick))
+    except StopIteration as last:
+        constraints, induced = last.value
+    return reduction.expand_constraints(constraints), reduction.expand_constraints(induced)
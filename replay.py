@@ -0,0 +1,226 @@
+"""Headless replay of recorded navigations, for regression checks and bulk analysis.
+
+A manifest gives the runs, one JSON object per line, each naming a context
+and a pick script, a JSON list of the picks sent in turn to the navigation:
+
+    {"id": "small-1", "context": "data.lp", "script": "picks.json"}
+    {"context": "big.nvc", "index": "big.idx.npz", "picks": [[0, "a", "in"], "undo"]}
+
+A pick is [dimension idx, elem, "in", "out" or null], a list of such picks
+sent together, "undo", "redo" or ["goto", position]. Runs are shared among
+worker processes, each one loading and grounding a context once for all
+its runs (see server.Backend), and one record per run is appended to the
+output as soon as it is done:
+
+    python3 replay.py manifest.jsonl --output results.jsonl --processes 4
+
+Runs already recorded in the output are skipped, so an interrupted batch
+is resumed by running the same command again. Runs that failed are
+retried, their new record being appended after the old one.
+
+"""
+
+
+import os
+import json
+import time
+import argparse
+import multiprocessing
+
+import loaders
+import nconcept
+import navigation
+import tuning
+from index import ConceptIndex
+from server import Backend, encode_constraints
+
+
+# Backends of the contexts already used by the process, by (context, format, index, cache_dir).
+_BACKENDS = {}
+
+
+def read_manifest(path:str) -> iter:
+    """Yield the runs described in given manifest, as dicts with an id,
+    with paths relative to the manifest directory made absolute.
+
+    A run without id is identified by its context and script,
+    or by its line number if its picks are given inline.
+
+    """
+    root = os.path.dirname(os.path.abspath(path))
+    with open(path) as fd:
+        for number, line in enumerate(fd, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if 'script' in entry:
+                entry.setdefault('id', '{}:{}'.format(entry['context'], entry['script']))
+            else:
+                entry.setdefault('id', '{}:{}'.format(os.path.basename(path), number))
+            for field in ('context', 'script', 'index'):
+                if field in entry:
+                    entry[field] = os.path.join(root, entry[field])
+            yield entry
+
+
+def read_script(path:str) -> list:
+    """Return the picks of given script file, ready to be sent to the navigation"""
+    with open(path) as fd:
+        return list(map(decode_pick, json.load(fd)))
+
+
+def decode_pick(data) -> tuple or list or str:
+    """Return the pick, list of picks or history command encoded in given JSON data"""
+    if isinstance(data, str):
+        return data
+    if data and data[0] == 'goto':
+        return tuple(data)
+    if not data or isinstance(data[0], list):
+        return list(map(tuple, data))
+    return tuple(data)
+
+
+def completed(path:str) -> set:
+    """Return the ids of the runs recorded without error in given output.
+
+    The last line, if left incomplete by an interruption, is removed.
+
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'rb+') as fd:
+        content = fd.read()
+        if content and not content.endswith(b'\n'):
+            fd.truncate(content.rfind(b'\n') + 1)
+            content = content[:content.rfind(b'\n') + 1]
+    done = set()
+    for line in content.decode().splitlines():
+        record = json.loads(line)
+        if 'error' in record:
+            done.discard(record['id'])
+        else:
+            done.add(record['id'])
+    return done
+
+
+def backend(context_path:str, format:str=None, index_path:str=None, cache_dir:str=None) -> (Backend, float):
+    """Return the backend of given context for this process, and the time
+    spent loading it, 0 if it was already loaded."""
+    key = context_path, format, index_path, cache_dir
+    if key in _BACKENDS:
+        return _BACKENDS[key], 0.
+    start = time.perf_counter()
+    context = loaders.load(context_path, format)
+    index = ConceptIndex.load(index_path, context) if index_path else None
+    _BACKENDS[key] = Backend(context, index, cache_dir)
+    return _BACKENDS[key], time.perf_counter() - start
+
+
+def replay(backend:Backend, picks:list) -> dict:
+    """Return the record of a navigation over the backend context,
+    driven by given picks.
+
+    Picks are checked before being sent, raising ValueError if invalid.
+    The record gives the final concept, made of the required elements, whether
+    it is the only one left, the number of rounds, the picks not sent because
+    the navigation ended before, the picks rejected because no concept meets
+    them, the user constraints, the time of each step and the solving statistics.
+    A navigation ending on constraints that are not a concept is not finished,
+    and its last pick is given as failing.
+
+    """
+    steps, rejected = [], []
+    start = time.perf_counter()
+    with nconcept.collect_statistics() as stats:
+        finder = navigation.find_concepts_interactively(
+            backend.context, have_concept=backend.have_concept, propagator=backend.propagator,
+            on_step=lambda stats: steps.append(stats['time']),
+            on_reject=lambda pick: rejected.append([rounds, pick]),
+        )
+        picks, rounds, finished, pick = iter(picks), 0, False, None
+        try:
+            constraints, induced = next(finder)
+            for pick in picks:
+                navigation.check_pick(backend.context, constraints, induced, pick)
+                rounds += 1
+                constraints, induced = finder.send(pick)
+        except StopIteration as last:
+            (constraints, induced), finished = last.value, True
+        failing = finished and not backend.have_concept(backend.context, induced)
+    record = {
+        'concept': [sorted(induced[idx][0]) for idx in sorted(induced)],
+        'finished': finished and not failing,
+        'rounds': rounds,
+        'unused': sum(1 for _ in picks),
+        'rejected': rejected,
+        'constraints': encode_constraints(constraints),
+        'seconds': time.perf_counter() - start,
+        'steps': steps,
+        'stats': stats.as_dict(),
+    }
+    if failing:
+        record['failing'] = pick
+    return record
+
+
+def replay_run(entry:dict, cache_dir:str=None) -> dict:
+    """Return the record of given manifest run, holding the error message
+    instead of the results if it failed."""
+    record = {'id': entry['id'], 'context': entry['context'], 'script': entry.get('script')}
+    try:
+        if 'script' in entry:
+            picks = read_script(entry['script'])
+        else:
+            picks = list(map(decode_pick, entry['picks']))
+        runner, record['load'] = backend(entry['context'], entry.get('format'),
+                                         entry.get('index'), cache_dir)
+        record.update(replay(runner, picks))
+    except Exception as error:
+        record['error'] = '{}: {}'.format(type(error).__name__, error)
+    return record
+
+
+def replay_all(runs:iter, output:str, processes:int=None, cache_dir:str=None) -> iter:
+    """Yield the records of given runs not already done according to given
+    output file, as they are appended to it by a pool of processes."""
+    done = completed(output)
+    todo = ((entry, cache_dir) for entry in runs if entry['id'] not in done)
+    with multiprocessing.Pool(processes) as pool, open(output, 'a') as fd:
+        for record in pool.imap_unordered(_run, todo):
+            fd.write(json.dumps(record) + '\n')
+            fd.flush()
+            yield record
+
+
+def _run(args:tuple) -> dict:
+    """Return the record of given (run, cache_dir)"""
+    return replay_run(*args)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('manifest', help='JSON lines file giving the runs')
+    parser.add_argument('--output', default='replay.jsonl',
+                        help='JSON lines file receiving the records, also used to resume')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of worker processes ; default to the number of CPUs')
+    parser.add_argument('--ground-cache', default=None, metavar='DIR',
+                        help='directory keeping the ground programs between runs and processes')
+    parser.add_argument('--tuning', default=None, metavar='FILE',
+                        help='solver configurations found by tuning.py')
+    args = parser.parse_args()
+
+    if args.tuning:
+        tuning.load(args.tuning)
+    failed = 0
+    for record in replay_all(read_manifest(args.manifest), args.output,
+                             args.processes, args.ground_cache):
+        failed += 'error' in record
+        print(record['id'], record.get('error') or '{} rounds, {:.3f}s'.format(
+            record['rounds'], record['seconds']))
+    if failed:
+        raise SystemExit('{} runs failed'.format(failed))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,349 @@
+"""Headless navigation server, running many interactive concept searches
+over contexts loaded and grounded once.
+
+Clients send JSON requests, one per line, over TCP or a unix socket:
+
+    python3 server.py data.lp --port 8765
+    python3 server.py big.nvc --unix /tmp/navicept.sock --index big.nvc=big.idx.npz
+
+    {"id": 1, "op": "contexts"}
+    {"id": 2, "op": "open", "context": "data.lp"}
+    {"id": 3, "op": "pick", "session": 1, "dim": 0, "elem": "a", "decision": "in"}
+    {"id": 4, "op": "undo", "session": 1}
+    {"id": 5, "op": "redo", "session": 1}
+    {"id": 6, "op": "close", "session": 1}
+    {"id": 7, "op": "stats"}
+    {"id": 8, "op": "stats", "session": 2}
+
+Each answer is a JSON object on one line, repeating the request id, and
+holding either an error message or the result. Navigation results give
+the user and induced constraints as [[required], [forbidden]] per dimension.
+Initial constraints given to open, and picks, must keep at least one concept.
+
+Requests of a connection are answered in order. Navigation steps of all
+connections go through a bounded queue to a fixed pool of worker threads,
+so a connection waiting for a queue slot is not read anymore.
+
+"""
+
+
+import json
+import asyncio
+import argparse
+import itertools
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import loaders
+import nconcept
+import navigation
+import tuning
+from index import ConceptIndex
+
+
+class RequestError(Exception):
+    """Raised on a request that can't be answered"""
+
+
+class Backend:
+    """Solving resources of a context, shared by all its navigation sessions.
+
+    If a concept index is given, it answers all the queries.
+    Otherwise the context is grounded once in a nconcept.Session,
+    propagating by consequences. Ground programs are kept in cache_dir if given.
+
+    """
+
+    def __init__(self, context, index:ConceptIndex=None, cache_dir:str=None):
+        self.context = context
+        self.index = index
+        if index:
+            self.have_concept, self.propagator = index.have_concept, index.propagate
+        else:
+            session = nconcept.Session(context, cache_dir=cache_dir)
+            self.have_concept = session.have_concept
+            self.propagator = partial(navigation.propagate_by_consequences, session=session)
+
+    def as_dict(self) -> dict:
+        return {
+            'dimensions': [len(dim) for dim in self.context.sets],
+            'relations': len(self.context.relations),
+            'index': self.index is not None,
+        }
+
+
+class NavigationSession:
+    """One navigation of a client, whose steps are run by the worker threads.
+
+    stats -- nconcept.Statistics of the work done by the steps of the session only
+
+    """
+
+    def __init__(self, backend:Backend, constraints:dict=None):
+        self.backend = backend
+        self.lock = asyncio.Lock()
+        self.initial_constraints = constraints
+        self.stats = nconcept.Statistics()
+        self.coroutine = navigation.find_concepts_interactively(
+            backend.context, have_concept=backend.have_concept,
+            propagator=backend.propagator, constraints=constraints,
+        )
+        self.constraints, self.induced, self.done = None, None, False
+
+    def step(self, pick:tuple=None) -> dict:
+        """Send given pick, or start the navigation if None, and return the new state.
+
+        Raise RequestError if the initial constraints allow no concept.
+
+        """
+        try:
+            with nconcept.collect_statistics(self.stats):
+                if pick is None:
+                    if self.initial_constraints and not self.backend.have_concept(
+                            self.backend.context, self.initial_constraints):
+                        raise RequestError("No concept meets given constraints")
+                    result = next(self.coroutine)
+                else:
+                    result = self.coroutine.send(pick)
+        except StopIteration as last:
+            result, self.done = last.value, True
+        except Exception:
+            self.done = True  # the coroutine can't be resumed
+            raise
+        self.constraints, self.induced = result
+        return self.as_dict()
+
+    def check(self, dim:int, elem:str, decision:str or None):
+        """Raise RequestError if given pick can't be sent to the navigation"""
+        if self.done:
+            raise RequestError("Navigation is over")
+        try:
+            navigation.check_pick(self.backend.context, self.constraints, self.induced,
+                                  (dim, elem, decision))
+        except ValueError as error:
+            raise RequestError(str(error)) from error
+
+    def as_dict(self) -> dict:
+        return {
+            'constraints': encode_constraints(self.constraints),
+            'induced': encode_constraints(self.induced),
+            'done': self.done,
+        }
+
+
+class Server:
+    """Navigation sessions over given {name: Backend}, answering
+    the JSON requests of clients.
+
+    workers -- number of threads running navigation steps
+    queue_size -- number of steps waiting for a worker before clients
+                  are not read anymore
+
+    """
+
+    def __init__(self, backends:dict, workers:int=4, queue_size:int=64):
+        self.backends = backends
+        self.sessions = {}  # id -> NavigationSession
+        self.session_ids = itertools.count(1)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue = None
+
+
+    async def serve(self, host:str='localhost', port:int=8765, path:str=None):
+        """Serve clients on given TCP address, or unix socket path if given, forever"""
+        self.queue = asyncio.Queue(self.queue_size)
+        with ThreadPoolExecutor(self.workers) as executor:
+            workers = [asyncio.ensure_future(self.work(executor)) for _ in range(self.workers)]
+            if path:
+                server = await asyncio.start_unix_server(self.handle, path)
+            else:
+                server = await asyncio.start_server(self.handle, host, port)
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+
+    async def work(self, executor):
+        """Run the queued navigation steps in given executor"""
+        loop = asyncio.get_running_loop()
+        while True:
+            session, pick, future = await self.queue.get()
+            try:
+                result = await loop.run_in_executor(executor, session.step, pick)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.queue.task_done()
+
+    async def step(self, session:NavigationSession, pick:tuple=None) -> dict:
+        """Queue given navigation step, and return its result"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((session, pick, future))
+        return await future
+
+
+    async def handle(self, reader, writer):
+        """Answer the requests of a client, and close its sessions once disconnected"""
+        opened = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                answer = await self.answer(line, opened)
+                writer.write(json.dumps(answer).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in opened:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def answer(self, line:bytes, opened:set) -> dict:
+        """Return the answer to given request line"""
+        request = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("Request must be a JSON object")
+            operation = getattr(self, 'op_' + str(request.get('op')), None)
+            if operation is None:
+                raise RequestError("Unknown op {}".format(request.get('op')))
+            result = await operation(request, opened)
+        except (RequestError, ValueError) as error:
+            return {'id': request.get('id'), 'error': str(error)}
+        except Exception as error:
+            return {'id': request.get('id'), 'error': '{}: {}'.format(type(error).__name__, error)}
+        result['id'] = request.get('id')
+        return result
+
+
+    async def op_contexts(self, request:dict, opened:set) -> dict:
+        return {'contexts': {name: backend.as_dict() for name, backend in self.backends.items()}}
+
+    async def op_open(self, request:dict, opened:set) -> dict:
+        if request.get('context') not in self.backends:
+            raise RequestError("Unknown context {}".format(request.get('context')))
+        backend = self.backends[request['context']]
+        constraints = request.get('constraints')
+        if constraints is not None:
+            constraints = decode_constraints(constraints, backend.context.sets)
+        session = NavigationSession(backend, constraints)
+        result = await self.step(session)
+        session_id = next(self.session_ids)
+        self.sessions[session_id] = session
+        opened.add(session_id)
+        result['session'] = session_id
+        return result
+
+    async def op_pick(self, request:dict, opened:set) -> dict:
+        session = self.session(request)
+        pick = request.get('dim'), request.get('elem'), request.get('decision')
+        async with session.lock:
+            session.check(*pick)
+            return await self.step(session, pick)
+
+    async def op_undo(self, request:dict, opened:set) -> dict:
+        return await self.history_step(request, 'undo')
+
+    async def op_redo(self, request:dict, opened:set) -> dict:
+        return await self.history_step(request, 'redo')
+
+    async def history_step(self, request:dict, command:str) -> dict:
+        """Send given history command to the targeted session"""
+        session = self.session(request)
+        async with session.lock:
+            if session.done:
+                raise RequestError("Navigation is over")
+            return await self.step(session, command)
+
+    async def op_close(self, request:dict, opened:set) -> dict:
+        self.session(request)
+        del self.sessions[request['session']]
+        opened.discard(request['session'])
+        return {}
+
+    async def op_stats(self, request:dict, opened:set) -> dict:
+        if 'session' in request:
+            return {'solving': self.session(request).stats.as_dict()}
+        return {
+            'solving': nconcept.STATS.as_dict(),
+            'sessions': len(self.sessions),
+            'queued': self.queue.qsize(),
+            'contexts': {name: backend.as_dict() for name, backend in self.backends.items()},
+        }
+
+    def session(self, request:dict) -> NavigationSession:
+        """Return the session targeted by given request"""
+        if request.get('session') not in self.sessions:
+            raise RequestError("Unknown session {}".format(request.get('session')))
+        return self.sessions[request['session']]
+
+
+def encode_constraints(constraints:dict) -> list:
+    """Return the JSON-compatible form of given constraints"""
+    return [[sorted(constraints[idx][0]), sorted(constraints[idx][1])]
+            for idx in sorted(constraints)]
+
+
+def decode_constraints(data:list, sets:tuple) -> dict:
+    """Return the constraints encoded by encode_constraints, over given
+    dimensions, raising RequestError if they are not valid."""
+    if not isinstance(data, list) or len(data) != len(sets):
+        raise RequestError("Constraints must give [[required], [forbidden]] for each dimension")
+    constraints = {}
+    for idx, (dim, pair) in enumerate(zip(sets, data)):
+        if not isinstance(pair, list) or len(pair) != 2:
+            raise RequestError("Constraints must give [[required], [forbidden]] for each dimension")
+        required, forbidden = set(pair[0]), set(pair[1])
+        if (required | forbidden) - dim:
+            raise RequestError("No element {} in dimension {}".format(
+                ', '.join(map(str, sorted((required | forbidden) - dim))), idx))
+        if required & forbidden:
+            raise RequestError("Elements {} are both required and forbidden".format(
+                ', '.join(sorted(required & forbidden))))
+        constraints[idx] = required, forbidden
+    return constraints
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('contexts', nargs='+', help='context files, see loaders.py for formats')
+    parser.add_argument('--input-format', default=None)
+    parser.add_argument('--index', action='append', default=[], metavar='CONTEXT=INDEX',
+                        help='concept index file to use for given context, see index.py')
+    parser.add_argument('--ground-cache', default=None, metavar='DIR',
+                        help='directory keeping the ground programs between runs')
+    parser.add_argument('--tuning', default=None, metavar='FILE',
+                        help='solver configurations found by tuning.py')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='serve on given unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of threads running navigation steps')
+    parser.add_argument('--queue', type=int, default=64,
+                        help='number of steps waiting for a worker before clients are throttled')
+    args = parser.parse_args()
+
+    if args.tuning:
+        tuning.load(args.tuning)
+    indexes = dict(option.split('=', 1) for option in args.index)
+    backends = {}
+    for path in args.contexts:
+        context = loaders.load(path, args.input_format)
+        index = ConceptIndex.load(indexes[path], context) if path in indexes else None
+        backends[path] = Backend(context, index, args.ground_cache)
+    server = Server(backends, args.workers, args.queue)
+    asyncio.run(server.serve(args.host, args.port, args.unix))
+
+
+if __name__ == "__main__":
+    cli()
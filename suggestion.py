@@ -0,0 +1,127 @@
+"""Suggestion of the next element to pick during a navigation.
+
+The best pick is the undecided element present in half of the remaining
+concepts: whatever the user decides, half of the concepts are discarded.
+Concepts are counted exactly with a concept index (see index.py),
+or else over the first models streamed by a nconcept.Session.
+
+Picks can also be made automatically, the user only answering whether
+each suggested element belongs to the concept searched:
+
+    python3 suggestion.py data.lp
+
+"""
+
+
+import argparse
+
+import loaders
+import nconcept
+from index import ConceptIndex
+from navigation import find_concepts_interactively
+
+
+def concept_counts(context, constraints:dict, index:ConceptIndex=None,
+                   session:nconcept.Session=None, limit:int=1000) -> (int, dict):
+    """Return the number of concepts meeting given constraints, and the
+    {(dimension idx, elem): number of these concepts containing it}.
+
+    With an index, counts are exact. Otherwise, only the first limit
+    concepts found by the session (or a new one) are counted.
+
+    """
+    counts = {}
+    if index is not None:
+        remaining = index.concepts(constraints)
+        for idx, dim in enumerate(context.sets):
+            for elem in dim:
+                counts[idx, elem] = bin(remaining & index.postings.get((idx, elem), 0)).count('1')
+        return bin(remaining).count('1'), counts
+    session = session or nconcept.Session(context)
+    total = 0
+    concepts = session.iter_concepts(context, constraints)
+    try:
+        for concept in concepts:
+            total += 1
+            for idx, dim in enumerate(concept):
+                for elem in dim:
+                    counts[idx, elem] = counts.get((idx, elem), 0) + 1
+            if total >= limit:
+                break
+    finally:
+        concepts.close()  # release the session
+    return total, counts
+
+
+def suggest_picks(context, constraints:dict, count:int=5, index:ConceptIndex=None,
+                  session:nconcept.Session=None, limit:int=1000) -> list:
+    """Return the [(score, dimension idx, elem)] of at most count undecided
+    elements, from the best pick to the worst.
+
+    The score is the fraction of remaining concepts discarded by the
+    worst decision about the element: 0.5 for an even split, 0 for
+    an element that can't discard anything.
+
+    """
+    total, counts = concept_counts(context, constraints, index, session, limit)
+    scored = []
+    for idx, dim in enumerate(context.sets):
+        required, forbidden = constraints[idx]
+        for elem in dim - (required | forbidden):
+            present = counts.get((idx, elem), 0)
+            score = min(present, total - present) / total if total else 0.
+            scored.append((-score, idx, elem))
+    return [(-score, idx, elem) for score, idx, elem in sorted(scored)[:count]]
+
+
+def bisect(context, answer, index:ConceptIndex=None, session:nconcept.Session=None,
+           limit:int=1000, **kwargs) -> (dict, dict):
+    """Return the final (constraints, induced constraints) of a navigation
+    where each pick is the best suggestion, decided by answer, the function
+    (dimension idx, elem) -> 'in' or 'out'.
+
+    Other parameters are given to navigation.find_concepts_interactively.
+
+    """
+    if index is not None:
+        kwargs.setdefault('have_concept', index.have_concept)
+        kwargs.setdefault('propagator', index.propagate)
+    else:
+        session = session or nconcept.Session(context)
+        kwargs.setdefault('have_concept', session.have_concept)
+    finder = find_concepts_interactively(context, **kwargs)
+    try:
+        _, induced = next(finder)
+        while True:
+            (_, idx, elem), *_ = suggest_picks(context, induced, 1, index, session, limit)
+            _, induced = finder.send((idx, elem, answer(idx, elem)))
+    except StopIteration as last:
+        return last.value
+
+
+def _user_answer(idx:int, elem:str) -> str:
+    """Return the decision of user about given element, based on stdin"""
+    decision = None
+    while decision not in {'in', 'out'}:
+        decision = input('Is {} (dimension {}) in the concept? [in/out]> '.format(elem, idx))
+    return decision
+
+
+def cli():
+    parser = argparse.ArgumentParser(description='Find a concept by answering suggested picks.')
+    parser.add_argument('context', help='context file, see loaders.py for formats')
+    parser.add_argument('--input-format', default=None)
+    parser.add_argument('--index', default=None, help='concept index of the context, see index.py')
+    parser.add_argument('--limit', type=int, default=1000,
+                        help='number of concepts counted without index')
+    args = parser.parse_args()
+
+    context = loaders.load(args.context, args.input_format)
+    index = ConceptIndex.load(args.index, context) if args.index else None
+    _, induced = bisect(context, _user_answer, index, limit=args.limit)
+    print('FINAL:', ' × '.join('{' + ','.join(sorted(induced[idx][0])) + '}'
+                               for idx in sorted(induced)))
+
+
+if __name__ == "__main__":
+    cli()
@@ -3,17 +3,24 @@
 """
 
 
-from asyncio import coroutine
+import sys
+import bisect
+from functools import partial
 from termcolor import cprint
+import loaders
+import nconcept
 from context import Context
-from navigation import find_concepts_interactively, pretty_nconcept
+from navigation import find_concepts_interactively, pretty_nconcept, propagate_by_consequences
+
+
+PAGE_SIZE = 20  # elements shown per search page or per kind of change
 
 
 def term_interface(context:Context) -> tuple:
     """Return the final concept found by user using terminal interface.
 
     """
-    concept_finder = find_concepts_interactively(context)
+    concept_finder = find_concepts_interactively(context, on_decision=_print_decision)
     # get context and constraints
     _, constraints = next(concept_finder)
     try:
@@ -23,6 +30,11 @@ def term_interface(context:Context) -> tuple:
         return last.value
 
 
+def _print_decision(idx:int, elem:str, decision:str):
+    """Show to user a decision induced by the propagation, as soon as it is found"""
+    cprint('\t{}:\t{} {}'.format(idx, elem, decision), 'green' if decision == 'in' else 'red')
+
+
 def _user_input(data:Context, constraints:dict) -> (int, str, str):
     """Return the dimension where the choosen element is,
     the choosen element itself, and the decision (in or out),
@@ -55,7 +67,171 @@ def _user_input(data:Context, constraints:dict) -> (int, str, str):
     return choosables[choosen], choosen, decision
 
 
+class ElementSearch:
+    """Index of the elements of all dimensions, sorted by label,
+    for prefix search by bisection and substring search by scan.
+
+    """
+
+    def __init__(self, context:Context):
+        self.entries = sorted((str(elem), idx, elem) for idx, dim in enumerate(context.sets)
+                              for elem in dim)
+
+    def prefix(self, text:str) -> iter:
+        """Yield (idx, elem) of elements which label starts with given text"""
+        for label, idx, elem in self.entries[bisect.bisect_left(self.entries, (text,)):]:
+            if not label.startswith(text):
+                break
+            yield idx, elem
+
+    def substring(self, text:str) -> iter:
+        """Yield (idx, elem) of elements which label contains given text"""
+        for label, idx, elem in self.entries:
+            if text in label:
+                yield idx, elem
+
+    def find(self, text:str) -> list:
+        """Return the [(idx, elem)] of elements named by given text,
+        which may be qualified with the dimension, like 0:elem."""
+        if ':' in text and text.split(':', 1)[0].isdigit():
+            idx, label = text.split(':', 1)
+            return [(dim, elem) for dim, elem in self.prefix(label)
+                    if dim == int(idx) and str(elem) == label]
+        return [(dim, elem) for dim, elem in self.prefix(text) if str(elem) == text]
+
+
+def large_term_interface(context:Context, page_size:int=PAGE_SIZE, **kwargs) -> tuple:
+    """Return the final concept found by user using a terminal interface
+    suited to large contexts: only the changes of each round are shown,
+    elements are found by searching, and many decisions are sent at once.
+
+    Other parameters are given to find_concepts_interactively; by default,
+    the propagation is done by consequences over a nconcept.Session.
+
+    """
+    if not kwargs:
+        session = nconcept.Session(context)
+        kwargs = {'have_concept': session.have_concept,
+                  'propagator': partial(propagate_by_consequences, session=session)}
+    kwargs.setdefault('on_reject', _print_rejection)
+    search = ElementSearch(context)
+    concept_finder = find_concepts_interactively(context, **kwargs)
+    constraints, induced = next(concept_finder)
+    _print_diff(context, {idx: (set(), set()) for idx in induced}, induced, page_size)
+    print(_LARGE_HELP)
+    previous = induced
+    try:
+        while True:
+            previous = {idx: (set(required), set(forbidden))
+                        for idx, (required, forbidden) in induced.items()}
+            picks = _user_batch(context, search, constraints, induced, page_size)
+            constraints, induced = concept_finder.send(picks)
+            _print_diff(context, previous, induced, page_size)
+    except StopIteration as last:
+        _print_diff(context, previous, last.value[1], page_size)
+        return last.value
+
+
+def _print_rejection(picks:list):
+    """Show to user that no concept meets the given picks, which were cancelled"""
+    cprint('\tNo concept meets these picks, they are cancelled', 'red')
+
+
+_LARGE_HELP = """Commands:
+\tp TEXT\tlist elements starting with TEXT
+\ts TEXT\tlist elements containing TEXT
+\tn\tnext page of the last listing
+\t+ELEM -ELEM =ELEM ...\trequire or forbid undecided elements, or release yours (ELEM or DIM:ELEM), all at once
+\tu\tshow the number of undecided elements
+\tundo, redo\tgo back to the previous state, or forward again"""
+
+
+def _print_diff(data:Context, previous:dict, induced:dict, page_size:int):
+    """Show to user the elements which state changed between given constraints"""
+    for idx in range(len(data.sets)):
+        old_required, old_forbidden = previous[idx]
+        required, forbidden = induced[idx]
+        changes = (('in', required - old_required, 'green'),
+                   ('out', forbidden - old_forbidden, 'red'),
+                   ('undecided', (old_required | old_forbidden) - (required | forbidden), 'white'))
+        for name, elems, color in changes:
+            if not elems:
+                continue
+            shown = sorted(elems, key=str)[:page_size]
+            more = ' … and {} more'.format(len(elems) - len(shown)) if len(elems) > len(shown) else ''
+            cprint('\t{}: {} {}{}'.format(idx, name, ' '.join(map(str, shown)), more), color)
+
+
+def _state(constraints:dict, induced:dict, idx:int, elem) -> (str, str):
+    """Return the state of given element, and its color"""
+    if elem in induced[idx][0]:
+        return ('IN' if elem in constraints[idx][0] else 'in'), 'green'
+    if elem in induced[idx][1]:
+        return ('OUT' if elem in constraints[idx][1] else 'out'), 'red'
+    return '?', 'white'
+
+
+def _user_batch(data:Context, search:ElementSearch, constraints:dict, induced:dict,
+                page_size:int) -> list:
+    """Return the list of (dimension idx, element, decision) choosen by user,
+    or the 'undo' or 'redo' command, based on stdin, after answering its searches."""
+    listing, page = [], 0
+    while True:
+        line = input('> ').strip()
+        command, _, argument = line.partition(' ')
+        if command in {'p', 's'} and argument:
+            found = search.prefix(argument) if command == 'p' else search.substring(argument)
+            listing, page = list(found), 0
+        elif command == 'n' and listing:
+            page += 1
+        elif command in {'undo', 'redo'}:
+            return command
+        elif command == 'u':
+            print('\tundecided:', ', '.join('{}: {}'.format(idx, len(dim - (induced[idx][0] | induced[idx][1])))
+                                           for idx, dim in enumerate(data.sets)))
+            continue
+        elif line and all(token[0] in '+-=' for token in line.split()):
+            picks = _parse_picks(line, search, constraints, induced)
+            if picks:
+                return picks
+            continue
+        else:
+            print(_LARGE_HELP)
+            continue
+        shown = listing[page*page_size:(page+1)*page_size]
+        for idx, elem in shown:
+            state, color = _state(constraints, induced, idx, elem)
+            cprint('\t{}:{}\t{}'.format(idx, elem, state), color)
+        print('\tpage {}/{} ({} elements)'.format(page + 1, max(1, -(-len(listing) // page_size)), len(listing)))
+
+
+def _parse_picks(line:str, search:ElementSearch, constraints:dict, induced:dict) -> list:
+    """Return the picks written in given line, or None if one is invalid:
+    only undecided elements can be required or forbidden, and only
+    the elements decided by user can be released."""
+    picks = []
+    for token in line.split():
+        decision = {'+': 'in', '-': 'out', '=': None}[token[0]]
+        found = search.find(token[1:])
+        if len(found) != 1:
+            print('\t{} element named {}{}'.format('No' if not found else 'More than one', token[1:],
+                                                   '' if not found else ', prefix it with its dimension'))
+            return None
+        idx, elem = found[0]
+        if decision is None and elem not in constraints[idx][0] | constraints[idx][1]:
+            print('\t{} was not decided by you'.format(token[1:]))
+            return None
+        if decision and elem in induced[idx][0] | induced[idx][1]:
+            print('\t{} is already decided'.format(token[1:]))
+            return None
+        picks.append((idx, elem, decision))
+    return picks
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:  # a context file, see loaders.py
+        print('FINAL:', pretty_nconcept(large_term_interface(loaders.load(sys.argv[1]))[1]))
+        sys.exit()
     context = Context(({'1', '2', '3'}, {'a', 'b', 'c'}),
                       {('1', 'a'), ('1', 'b'), ('2', 'b'), ('2', 'c'), ('3', 'c')})
 
@@ -0,0 +1,10 @@
+def random_queries(context, rng, count:int, max_forbidden:int=2):
+    """Yield count random constraints over given context, requiring up to
+    two elements and forbidding up to max_forbidden elements per dimension"""
+    for _ in range(count):
+        constraints = {}
+        for idx, dim in enumerate(context.sets):
+            elems = sorted(dim)
+            required = set(rng.sample(elems, rng.randint(0, 2)))
+            constraints[idx] = required, set(rng.sample(elems, rng.randint(0, max_forbidden))) - required
+        yield constraints
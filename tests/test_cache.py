@@ -0,0 +1,41 @@
+import random
+import itertools
+
+import dyadic
+from cache import ConceptCache
+from context import Context
+from helpers import random_queries
+
+
+def test_cache_agrees_with_engine():
+    context = Context.with_random_relations(({'a', 'b', 'c', 'd'}, {'e', 'f', 'g', 'h'}), 0.5, seed=1)
+    cache = ConceptCache(dyadic.have_concept, maxsize=16)
+    for constraints in random_queries(context, random.Random(0), 300):
+        assert cache.have_concept(context, constraints) == dyadic.have_concept(context, constraints)
+    info = cache.cache_info()
+    assert info.dominance_hits > 0
+    assert info.currsize <= 16
+
+
+def test_dominance_by_subset_and_superset():
+    calls = []
+    def have_concept(context, constraints):
+        calls.append(constraints)
+        return not constraints[0][0]
+    context = Context(({'a', 'b'}, {'c'}), frozenset({('a', 'c')}))
+    cache = ConceptCache(have_concept)
+    assert not cache.have_concept(context, {0: ({'a'}, set()), 1: (set(), set())})
+    assert not cache.have_concept(context, {0: ({'a', 'b'}, set()), 1: ({'c'}, set())})
+    assert cache.have_concept(context, {0: (set(), {'a'}), 1: ({'c'}, set())})
+    assert cache.have_concept(context, {0: (set(), set()), 1: ({'c'}, set())})
+    assert cache.have_concept(context, {0: (set(), set()), 1: (set(), set())})
+    assert len(calls) == 2
+
+
+def test_evicted_entries_are_not_used():
+    context = Context(({'a', 'b', 'c'}, {'d'}), frozenset())
+    cache = ConceptCache(lambda context, constraints: False, maxsize=1)
+    for elem in 'abc':
+        cache.have_concept(context, {0: ({elem}, set()), 1: (set(), set())})
+    indexed = set(itertools.chain.from_iterable(cache.postings[False].values()))
+    assert indexed == set(cache.entries) and len(indexed) == 1
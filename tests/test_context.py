@@ -0,0 +1,50 @@
+import random
+
+import numpy
+
+from context import Context, ArrayContext
+
+
+DIMENSIONS = ({'a', 'b', 'c', 'd'}, {'e', 'f', 'g'}, {'h', 'i'})
+
+
+def test_fingerprint_agrees_across_representations():
+    context = Context.with_random_relations(DIMENSIONS, 0.5, seed=0)
+    fingerprints = {context.fingerprint()}
+    for storage in ArrayContext.STORAGES:
+        array_context = ArrayContext.from_context(context, storage)
+        fingerprints |= {array_context.fingerprint(), array_context.to_context().fingerprint()}
+    assert len(fingerprints) == 1
+
+
+def test_fingerprint_ignores_label_order():
+    incidence = numpy.array([[True, False], [False, True], [True, True]])
+    array_context = ArrayContext((('z', 'y', 'x'), ('b', 'a')), incidence)
+    reordered = ArrayContext((('x', 'y', 'z'), ('a', 'b')), incidence[::-1, ::-1])
+    assert array_context.fingerprint() == reordered.fingerprint() == array_context.to_context().fingerprint()
+    assert array_context.fingerprint() != ArrayContext(array_context.labels, ~incidence).fingerprint()
+
+
+def test_random_relations_are_reproducible():
+    assert Context.with_random_relations(DIMENSIONS, seed=1) == Context.with_random_relations(DIMENSIONS, seed=1)
+    random.seed(2)
+    first = Context.with_random_relations(DIMENSIONS)
+    random.seed(2)
+    assert first == Context.with_random_relations(DIMENSIONS)
+
+
+def test_array_context_views():
+    context = Context.with_random_relations(DIMENSIONS, 0.5, seed=3)
+    for storage in ArrayContext.STORAGES:
+        array_context = ArrayContext.from_context(context, storage)
+        assert array_context.relations == context.relations
+        assert all(array_context.holds(*relation) for relation in context.relations)
+
+
+def test_relations_are_streamed_by_chunks(monkeypatch):
+    monkeypatch.setattr(ArrayContext, 'CHUNK_SIZE', 2)
+    context = Context.with_random_relations(DIMENSIONS, 0.5, seed=4)
+    for storage in ArrayContext.STORAGES:
+        streamed = list(ArrayContext.from_context(context, storage).iter_relations())
+        assert len(streamed) == len(context.relations) and set(streamed) == context.relations
+    assert len(Context.with_random_relations(({'a'}, set(range(1000))), 0.3, seed=5).relations) in range(250, 350)
@@ -0,0 +1,11 @@
+import doctest
+
+import pytest
+
+import cache
+import nconcept
+
+
+@pytest.mark.parametrize('module', [cache, nconcept])
+def test_doctests(module):
+    assert doctest.testmod(module).failed == 0
@@ -0,0 +1,48 @@
+import queue
+
+import pytest
+
+gui = pytest.importorskip('gui')
+
+import dyadic
+from context import Context
+
+
+def test_navigator_always_answers():
+    context = Context(({'a', 'b'}, {'c', 'd'}), frozenset({('a', 'c'), ('b', 'd')}))
+    failing = []
+    def have_concept(context, constraints):
+        if failing:
+            raise ValueError('failing engine')
+        return dyadic.have_concept(context, constraints)
+    results = queue.Queue()
+    navigator = gui.Navigator(context, have_concept, results)
+    assert results.get(timeout=10)[1] == 'step'
+    failing.append(True)
+    navigator.send((0, 'a', 'out'))
+    _, kind, error = results.get(timeout=10)
+    assert kind == 'error' and 'failing engine' in str(error)
+    failing.clear()
+    navigator.send((0, 'a', 'in'))  # the navigation is over
+    _, kind, error = results.get(timeout=10)
+    assert kind == 'error' and isinstance(error, RuntimeError)
+
+
+def test_cancelled_navigator_leaves_history():
+    context = Context(({'a', 'b'}, {'c', 'd'}), frozenset({('a', 'c'), ('b', 'd')}))
+    history = gui.History()
+    navigator = gui.Navigator(context, dyadic.have_concept, queue.Queue(), history=history)
+    navigator.results.get(timeout=10)
+    state = history.current()
+    navigator.cancel()
+    with pytest.raises(gui.Cancelled):
+        navigator.history.record({0: ({'a'}, set()), 1: (set(), set())}, state[1])
+    assert len(history) == 1 and history.current() == state
+
+
+def test_restart_from_unsatisfiable_constraints_is_an_error():
+    context = Context(({'a', 'b'}, {'c', 'd'}), frozenset({('a', 'c'), ('b', 'd')}))
+    results = queue.Queue()
+    gui.Navigator(context, dyadic.have_concept, results, {0: ({'a'}, set()), 1: ({'d'}, set())})
+    _, kind, error = results.get(timeout=10)
+    assert kind == 'error' and 'No concept' in str(error)
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+import navigation
+import nconcept
+from context import Context
+from helpers import random_queries
+from index import ConceptIndex
+
+
+CONTEXT = Context.with_random_relations(({'a', 'b', 'c', 'd'}, {'e', 'f', 'g'}, {'h', 'i'}), 0.6, seed=2)
+
+
+def test_saved_index_answers_like_the_solver(tmp_path):
+    path = str(tmp_path / 'context.idx.npz')
+    ConceptIndex.build(CONTEXT).save(path)
+    index = ConceptIndex.load(path, CONTEXT)
+    concepts = list(nconcept.iter_concepts(CONTEXT))
+    assert index.nb_concept == len(concepts) == index.count({})
+    for query in random_queries(CONTEXT, random.Random(2), 30):
+        meeting = [concept for concept in concepts
+                   if all(required <= concept[idx] and not forbidden & concept[idx]
+                          for idx, (required, forbidden) in query.items())]
+        assert index.count(query) == bin(index.concepts(query)).count('1') == len(meeting)
+        assert index.have_concept(CONTEXT, query) == nconcept.have_concept(CONTEXT, query) == bool(meeting)
+        if meeting:
+            assert index.propagate(CONTEXT, query) == navigation.propagate(
+                CONTEXT, query, have_concept=nconcept.have_concept)
+
+
+def test_load_refuses_another_context(tmp_path):
+    path = str(tmp_path / 'context.idx.npz')
+    ConceptIndex.build(CONTEXT).save(path)
+    other = Context.with_random_relations(CONTEXT.sets, 0.6, seed=3)
+    with pytest.raises(ValueError):
+        ConceptIndex.load(path, other)
@@ -0,0 +1,73 @@
+import os
+
+import numpy
+import pytest
+
+import loaders
+from context import Context, ArrayContext
+
+
+CONTEXT = Context(({'a', 'b', 'c'}, {'d', 'e', 'f'}),
+                  frozenset({('a', 'd'), ('a', 'e'), ('b', 'e'), ('b', 'f'), ('c', 'f')}))
+
+
+def same(loaded, context=CONTEXT):
+    return tuple(loaded.sets) == tuple(context.sets) and loaded.relations == context.relations
+
+
+@pytest.mark.parametrize('extension, delimiter', [('.csv', ','), ('.tsv', '\t')])
+def test_incidence_round_trip(tmp_path, extension, delimiter):
+    path = tmp_path / ('context' + extension)
+    path.write_text(''.join(delimiter.join(relation) + '\n\n' for relation in sorted(CONTEXT.relations)))
+    assert same(loaders.load(str(path)))
+
+
+def test_crosstable_round_trip(tmp_path):
+    objects, attributes = sorted(CONTEXT.sets[0]), sorted(CONTEXT.sets[1])
+    lines = [','.join([''] + attributes)]
+    lines += [','.join([obj] + ['x' if (obj, attr) in CONTEXT.relations else '' for attr in attributes])
+              for obj in objects]
+    path = tmp_path / 'context.csv'
+    path.write_text('\n'.join(lines) + '\n')
+    assert same(loaders.load(str(path), 'crosstable', delimiter=','))
+
+
+def test_facts(tmp_path):
+    path = tmp_path / 'context.lp'
+    path.write_text('% a comment with rel(z,z).\n'
+                    'set(1,(a;b;c)). set(2,"d"). set(2,(e;f)).\n'
+                    'set(2,g).  % declared, related to nothing\n'
+                    'rel(a,d). rel(a,\n'
+                    '  e). rel(b,(e;f)).\n'
+                    'rel(c,"f").\n'
+                    'rel(X,Y) :- rel(Y,X).\n'
+                    'other(a).\n')
+    expected = Context((CONTEXT.sets[0], CONTEXT.sets[1] | {'g'}), CONTEXT.relations)
+    assert same(loaders.load(str(path)), expected)
+
+
+def test_data_lp_is_read():
+    data = loaders.load(os.path.join(os.path.dirname(__file__), '..', 'data.lp'))
+    assert [len(dim) for dim in data.sets] == [5, 4]
+
+
+def test_binary_round_trip(tmp_path):
+    context = Context.with_random_relations(({'a', 'b', 'c'}, {'d', 'e', 'f', 'g'}, {'h', 'i', 'j'}), 0.5, seed=0)
+    path = str(tmp_path / 'context.nvc')
+    loaders.write_binary(context, path)
+    mapped = loaders.load(path)
+    assert isinstance(mapped.incidence, numpy.memmap) and mapped.storage == 'packed'
+    assert mapped.relations == context.relations
+    # rewriting the memory-mapped context, and an in-memory packed one
+    for source in (mapped, ArrayContext.from_context(context, 'packed')):
+        copy = str(tmp_path / 'copy.nvc')
+        loaders.write_binary(source, copy)
+        assert loaders.read_binary(copy).relations == context.relations
+        assert loaders.read_binary(copy).fingerprint() == context.fingerprint()
+
+
+def test_binary_refuses_other_files(tmp_path):
+    path = tmp_path / 'context.nvc'
+    path.write_bytes(b'NOTNAVIC' + bytes(32))
+    with pytest.raises(ValueError):
+        loaders.read_binary(str(path))
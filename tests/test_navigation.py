@@ -0,0 +1,73 @@
+from functools import partial
+
+import pytest
+
+import dyadic
+import navigation
+from cache import freeze_constraints
+from context import Context
+
+
+CONTEXT = Context(({'a', 'b', 'c'}, {'d', 'e', 'f'}),
+                  frozenset({('a', 'd'), ('a', 'e'), ('b', 'e'), ('b', 'f'), ('c', 'f')}))
+
+
+def navigate(picks, **kwargs):
+    finder = navigation.find_concepts_interactively(CONTEXT, **kwargs)
+    try:
+        next(finder)
+        for pick in picks:
+            finder.send(pick)
+    except StopIteration as last:
+        return last.value
+    pytest.fail('navigation not over')
+
+
+def test_propagators_give_the_same_concept():
+    picks = [(0, 'a', 'in'), (1, 'd', 'out')]
+    expected = navigate(picks, have_concept=dyadic.have_concept)
+    for propagator in (partial(navigation.propagate, have_concept=dyadic.have_concept),
+                       partial(navigation.propagate_in_parallel, have_concept=dyadic.have_concept),
+                       navigation.propagate_by_consequences):
+        assert navigate(picks, have_concept=dyadic.have_concept, propagator=propagator) == expected
+
+
+def test_on_decision_called_with_any_propagator():
+    for propagator in (None, navigation.propagate_by_consequences):
+        decisions = []
+        _, induced = navigate([(0, 'a', 'in'), (1, 'd', 'out')], have_concept=dyadic.have_concept,
+                              propagator=propagator, on_decision=lambda *decision: decisions.append(decision))
+        reported = {(idx, elem) for idx, elem, _ in decisions}
+        assert reported == {(0, 'b'), (0, 'c'), (1, 'e'), (1, 'f')}
+
+
+def test_unsatisfiable_picks_are_rejected():
+    rejected = []
+    finder = navigation.find_concepts_interactively(CONTEXT, have_concept=dyadic.have_concept,
+                                                    on_reject=rejected.append)
+    initial = next(finder)
+    assert finder.send([(0, 'a', 'in'), (1, 'f', 'in')]) == initial
+    constraints, induced = finder.send((0, 'a', 'in'))
+    assert finder.send((1, 'f', 'in')) == (constraints, induced)
+    assert constraints == {0: ({'a'}, set()), 1: (set(), set())}
+    assert rejected == [[(0, 'a', 'in'), (1, 'f', 'in')], (1, 'f', 'in')]
+
+
+def test_history_commands():
+    frozen = lambda state: tuple(map(freeze_constraints, state))
+    finder = navigation.find_concepts_interactively(CONTEXT, have_concept=dyadic.have_concept)
+    initial = frozen(next(finder))
+    assert frozen(finder.send([])) == initial
+    picked = frozen(finder.send((0, 'a', 'in')))
+    assert frozen(finder.send('undo')) == initial
+    assert frozen(finder.send(('goto', 1))) == picked
+    with pytest.raises(ValueError):
+        finder.send(('goto',))
+
+
+def test_unsatisfiable_initial_constraints_are_refused():
+    finder = navigation.find_concepts_interactively(
+        CONTEXT, have_concept=dyadic.have_concept,
+        constraints={0: ({'a'}, set()), 1: ({'f'}, set())})
+    with pytest.raises(ValueError):
+        next(finder)
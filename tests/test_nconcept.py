@@ -0,0 +1,100 @@
+import os
+import random
+import threading
+
+import dyadic
+import loaders
+import nconcept
+from context import Context
+from helpers import random_queries
+
+
+def test_engines_agree_on_random_contexts():
+    for seed in range(3):
+        context = Context.with_random_relations(({'a', 'b', 'c', 'd'}, {'e', 'f', 'g', 'h'}), 0.5, seed=seed)
+        session = nconcept.Session(context)
+        queries = list(random_queries(context, random.Random(seed), 20, max_forbidden=1))
+        expected = [dyadic.have_concept(context, query) for query in queries]
+        assert [nconcept.have_concept(context, query) for query in queries] == expected
+        assert [session.have_concept(context, query) for query in queries] == expected
+        assert nconcept.have_concepts(context, queries) == expected
+
+
+def test_triadic_engines_agree():
+    context = Context.with_random_relations(({'a', 'b', 'c'}, {'d', 'e', 'f'}, {'g', 'h'}), 0.6, seed=4)
+    session = nconcept.Session(context)
+    queries = list(random_queries(context, random.Random(4), 20, max_forbidden=1))
+    assert [nconcept.have_concept(context, query) for query in queries] == \
+        [session.have_concept(context, query) for query in queries] == \
+        nconcept.have_concepts(context, queries)
+
+
+def test_collected_statistics_exclude_other_threads():
+    context = Context.with_random_relations(({'a', 'b'}, {'c', 'd'}), 0.5, seed=0)
+    query = {0: (set(), set()), 1: (set(), set())}
+    other = threading.Thread(target=lambda: [nconcept.have_concept(context, query) for _ in range(5)])
+    with nconcept.collect_statistics() as stats:
+        other.start()
+        nconcept.have_concept(context, query)
+        other.join()
+    assert stats.calls == 1
+    with nconcept.collect_statistics() as stats:
+        worker = threading.Thread(target=nconcept.collecting(nconcept.have_concept), args=(context, query))
+        worker.start()
+        worker.join()
+    assert stats.calls == 1
+
+
+def test_parallel_enumeration_streams_all_concepts():
+    context = Context.with_random_relations(({'a', 'b', 'c', 'd', 'e'}, {'f', 'g', 'h', 'i'}, {'j', 'k'}), 0.6, seed=5)
+    expected = set(nconcept.iter_concepts(context))
+    for pivots in (0, 2, 10):
+        found = list(nconcept.iter_concepts_in_parallel(context, pivots, processes=2, chunk_size=2))
+        assert len(found) == len(set(found)) and set(found) == expected
+    concepts = nconcept.iter_concepts_in_parallel(context, 1, processes=2, chunk_size=1)
+    next(concepts)
+    concepts.close()  # stopping early terminates the pool
+
+
+def test_parallel_enumeration_of_mapped_context(tmp_path):
+    context = Context.with_random_relations(({'a', 'b', 'c', 'd'}, {'e', 'f', 'g'}, {'h', 'i'}), 0.6, seed=7)
+    path = str(tmp_path / 'context.nvc')
+    loaders.write_binary(context, path)
+    mapped = loaders.read_binary(path)
+    found = list(nconcept.iter_concepts_in_parallel(mapped, 2, processes=2))
+    assert len(found) == len(set(found)) and set(found) == set(nconcept.iter_concepts(context))
+
+
+def test_cached_ground_program(tmp_path):
+    context = Context.with_random_relations(({'a', 'b', 'c'}, {'d', 'e', 'f'}, {'g', 'h'}), 0.6, seed=6)
+    queries = list(random_queries(context, random.Random(6), 20, max_forbidden=1))
+    sizes, answers = [], []
+    for cache_dir in (None, str(tmp_path), str(tmp_path)):  # grounded, written then loaded, loaded
+        with nconcept.collect_statistics() as stats:
+            session = nconcept.Session(context, cache_dir=cache_dir)
+        sizes.append(stats.atoms)
+        answers.append([session.have_concept(context, query) for query in queries])
+    assert sizes[0] == sizes[1] == sizes[2] > 0
+    assert answers[0] == answers[1] == answers[2]
+
+
+def test_one_shot_calls_record_program_size():
+    context = Context.with_random_relations(({'a', 'b'}, {'c', 'd'}), 0.5, seed=0)
+    with nconcept.collect_statistics() as stats:
+        nconcept.have_concept(context, {0: (set(), set()), 1: (set(), set())})
+    assert stats.calls == 1 and stats.atoms > 0
+
+
+def test_concurrent_writes_of_a_ground_program(tmp_path):
+    context = Context.with_random_relations(({'a', 'b', 'c'}, {'d', 'e', 'f'}), 0.6, seed=8)
+    path = str(tmp_path / 'program.aspif')
+    writers = [threading.Thread(target=nconcept.write_ground_program,
+                                args=(context, nconcept.ASP_FILES, path)) for _ in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert sorted(os.listdir(str(tmp_path))) == ['program.aspif', 'program.aspif.json']
+    session = nconcept.Session(context, cache_dir=str(tmp_path))
+    assert session.have_concept(context, {0: (set(), set()), 1: (set(), set())}) == \
+        nconcept.have_concept(context, {0: (set(), set()), 1: (set(), set())})
@@ -0,0 +1,25 @@
+import nconcept
+import reduction
+from context import Context
+
+
+def test_clarified_context_has_the_same_concepts():
+    context = Context(({'a', 'b', 'c', 'd'}, {'e', 'f', 'g'}),
+                      frozenset({('a', 'e'), ('b', 'e'), ('a', 'f'), ('b', 'f'), ('c', 'g'), ('d', 'f')}))
+    reduced = reduction.Reduction(context)
+    assert reduced.classes[0]['a'] == {'a', 'b'} and reduced.ratio() < 1
+    expected = set(nconcept.iter_concepts(context))
+    assert {reduced.expand_concept(concept) for concept in nconcept.iter_concepts(reduced.context)} == expected
+
+
+def test_reduced_navigation():
+    context = Context(({'a', 'b', 'c'}, {'e', 'f'}),
+                      frozenset({('a', 'e'), ('b', 'e'), ('c', 'f')}))
+    finder = reduction.find_concepts_interactively(context)
+    constraints, induced = next(finder)
+    assert finder.send('undo') == (constraints, induced)  # nothing to undo
+    try:
+        finder.send([(0, 'a', 'in')])
+    except StopIteration as last:
+        constraints, induced = last.value
+    assert induced[0][0] == {'a', 'b'} and induced[1][0] == {'e'}
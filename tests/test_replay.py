@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+import loaders
+import replay
+from server import Backend
+
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data.lp')
+
+
+def test_rejected_picks_are_recorded():
+    backend = Backend(loaders.load(DATA))
+    record = replay.replay(backend, [[(0, 'a', 'in'), (1, 'i', 'in')], (0, 'a', 'in'), (1, 'g', 'in')])
+    assert record['rejected'] == [[1, [(0, 'a', 'in'), (1, 'i', 'in')]]]
+    assert record['finished'] and record['concept'] == [['a', 'f'], ['g', 'h']]
+    assert record['constraints'] == [[['a'], []], [['g'], []]]
+    assert record['stats']['calls'] > 0
+
+
+def test_final_non_concept_is_not_finished():
+    backend = Backend(loaders.load(DATA))
+    backend.propagator = lambda context, constraints: {idx: (set(dim), set())
+                                                       for idx, dim in enumerate(context.sets)}
+    record = replay.replay(backend, [(0, 'a', 'in')])
+    assert not record['finished'] and record['failing'] is None
+    assert record['unused'] == 1
+
+
+def test_invalid_picks_are_refused():
+    backend = Backend(loaders.load(DATA))
+    assert replay.decode_pick([]) == [] and replay.decode_pick(['goto', 1]) == ('goto', 1)
+    assert replay.replay(backend, [[], (0, 'a', 'in')])['constraints'][0] == [['a'], []]
+    for picks in ([(0, 'a', None)], [(0, 'z', 'in')], [(0, 'a', 'in'), (1, 'i', 'in')], [('goto',)]):
+        with pytest.raises(ValueError):
+            replay.replay(backend, picks)
@@ -0,0 +1,55 @@
+import json
+import asyncio
+
+import server
+from context import Context
+
+
+# the concepts containing a are {a}×{d,e} and {a,b}×{e}
+CONTEXT = Context(({'a', 'b', 'c'}, {'d', 'e', 'f'}),
+                  frozenset({('a', 'd'), ('a', 'e'), ('b', 'e'), ('b', 'f'), ('c', 'f')}))
+
+
+def exchange(tmp_path, requests):
+    srv = server.Server({'ctx': server.Backend(CONTEXT)}, workers=2, queue_size=4)
+    path = str(tmp_path / 'navicept.sock')
+    async def run():
+        serving = asyncio.ensure_future(srv.serve(path=path))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if (tmp_path / 'navicept.sock').exists():
+                break
+        reader, writer = await asyncio.open_unix_connection(path)
+        answers = []
+        for request in requests:
+            writer.write(json.dumps(request).encode() + b'\n')
+            answers.append(json.loads(await reader.readline()))
+        writer.close()
+        serving.cancel()
+        return answers
+    return asyncio.run(run())
+
+
+def test_open_validates_constraints(tmp_path):
+    unknown, unsatisfiable, valid = exchange(tmp_path, [
+        {'op': 'open', 'context': 'ctx', 'constraints': [[['z'], []], [[], []]]},
+        {'op': 'open', 'context': 'ctx', 'constraints': [[['a'], []], [['f'], []]]},
+        {'op': 'open', 'context': 'ctx', 'constraints': [[['a'], []], [[], []]]},
+    ])
+    assert 'No element z' in unknown['error']
+    assert 'No concept' in unsatisfiable['error']
+    assert valid['constraints'][0] == [['a'], []] and 'f' in valid['induced'][1][1]
+
+
+def test_picks_contradicting_induced_constraints_are_rejected(tmp_path):
+    opened, picked, contradiction, pick, stats = exchange(tmp_path, [
+        {'op': 'open', 'context': 'ctx'},
+        {'op': 'pick', 'session': 1, 'dim': 0, 'elem': 'a', 'decision': 'in'},
+        {'op': 'pick', 'session': 1, 'dim': 1, 'elem': 'f', 'decision': 'in'},
+        {'op': 'pick', 'session': 1, 'dim': 1, 'elem': 'd', 'decision': 'in'},
+        {'op': 'stats', 'session': 1},
+    ])
+    assert picked['constraints'][0] == [['a'], []] and 'f' in picked['induced'][1][1]
+    assert 'known to be out of' in contradiction['error']
+    assert pick['done'] and pick['induced'] == [[['a'], ['b', 'c']], [['d', 'e'], ['f']]]
+    assert stats['solving']['calls'] > 0
@@ -0,0 +1,28 @@
+import os
+
+import loaders
+import nconcept
+import suggestion
+from index import ConceptIndex
+
+
+DATA = loaders.load(os.path.join(os.path.dirname(__file__), '..', 'data.lp'))
+
+
+def test_bisect_finds_each_concept():
+    index = ConceptIndex.build(DATA)
+    concepts = list(nconcept.iter_concepts(DATA))
+    assert concepts
+    for target in concepts:
+        oracle = lambda idx, elem: 'in' if elem in target[idx] else 'out'
+        for engine in ({'index': index}, {}):
+            _, induced = suggestion.bisect(DATA, oracle, **engine)
+            assert tuple(frozenset(induced[idx][0]) for idx in sorted(induced)) == tuple(target)
+
+
+def test_suggestions_are_undecided_and_sorted():
+    constraints = {0: ({'a'}, set()), 1: (set(), set())}
+    exact = suggestion.suggest_picks(DATA, constraints, count=10, index=ConceptIndex.build(DATA))
+    assert exact == suggestion.suggest_picks(DATA, constraints, count=10)
+    assert all(0. <= score <= .5 and (idx, elem) != (0, 'a') for score, idx, elem in exact)
+    assert [score for score, _, _ in exact] == sorted((score for score, _, _ in exact), reverse=True)
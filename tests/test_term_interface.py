@@ -0,0 +1,17 @@
+import term_interface
+from context import Context
+
+
+CONTEXT = Context(({'a', 'b'}, {'c', 'd'}), frozenset({('a', 'c'), ('b', 'd')}))
+
+
+def test_only_undecided_elements_can_be_picked():
+    search = term_interface.ElementSearch(CONTEXT)
+    constraints = {0: ({'a'}, set()), 1: (set(), set())}
+    induced = {0: ({'a'}, {'b'}), 1: ({'c'}, {'d'})}
+    assert term_interface._parse_picks('=a', search, constraints, induced) == [(0, 'a', None)]
+    assert term_interface._parse_picks('+d', search, constraints, induced) is None
+    assert term_interface._parse_picks('-a', search, constraints, induced) is None
+    assert term_interface._parse_picks('=c', search, constraints, induced) is None
+    undecided = {0: (set(), set()), 1: (set(), set())}
+    assert term_interface._parse_picks('+a -d', search, undecided, undecided) == [(0, 'a', 'in'), (1, 'd', 'out')]
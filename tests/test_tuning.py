@@ -0,0 +1,37 @@
+import itertools
+
+import pytest
+
+import nconcept
+import tuning
+from context import Context, ArrayContext
+
+
+CONTEXT = Context.with_random_relations(({'a', 'b', 'c', 'd'}, {'e', 'f', 'g'}), 0.5, seed=0)
+
+
+def test_race_keeps_correct_configurations():
+    configurations = list(itertools.islice(tuning.candidates(CONTEXT, threads=()), 3))
+    results = tuning.race(CONTEXT, configurations, probes=5, repeat=2)
+    assert results and all(time > 0 for time, _ in results)
+    assert [time for time, _ in results] == sorted(time for time, _ in results)
+
+
+def test_shape_is_computed_once_per_context(monkeypatch):
+    array_context = ArrayContext.from_context(CONTEXT)
+    shape = nconcept.context_shape(array_context)
+    monkeypatch.setitem(nconcept.TUNED_CONFIGURATIONS, shape, {'encoding': ['simple.lp'], 'options': []})
+    calls = []
+    density = array_context.density
+    monkeypatch.setattr(array_context, 'density', lambda: calls.append(1) or density())
+    for _ in range(3):
+        assert nconcept.configuration(array_context) == ({'simple.lp'}, [])
+    assert len(calls) == 1
+
+
+def test_reference_failures_are_raised(monkeypatch):
+    with pytest.raises(RuntimeError):
+        tuning.race(CONTEXT, [{'encoding': ['missing.lp'], 'options': []}], probes=2, repeat=1)
+    monkeypatch.setattr(tuning, 'candidates', lambda context, threads: iter(()))
+    with pytest.raises(RuntimeError, match='No configuration'):
+        tuning.tune(CONTEXT, probes=2, repeat=1)
@@ -0,0 +1,165 @@
+"""Automatic choice of the solver configuration for a context.
+
+Candidate configurations, made of an encoding and clasp options, are raced
+on the same sampled existence tests, several times each, keeping their
+fastest run to filter out the noise of such short measures. A run is
+stopped as soon as its time exceeds the one of the best complete run,
+and a candidate is dropped if it disagrees with the default configuration. The winner is registered for the shape
+of the context (see nconcept.context_shape), so later sessions and
+have_concept calls over contexts of that shape use it:
+
+    python3 tuning.py data.lp --output tuning.json
+
+"""
+
+
+import json
+import time
+import random
+import argparse
+
+import loaders
+import nconcept
+from navigation import random_constraints
+
+
+PRESETS = ('auto', 'frumpy', 'jumpy', 'tweety', 'trendy', 'crafty')
+HEURISTICS = ('Berkmin', 'Vsids', 'Domain')
+THREADS = (2, 4)
+REPEAT = 5  # runs per configuration
+TUNING_FILE = 'tuning.json'
+
+
+def candidates(context, threads:iter=THREADS) -> iter:
+    """Yield the configurations worth trying on given context, as dicts
+    {'encoding': [ASP files], 'options': [clasp options]}.
+
+    Options are varied one at a time from the default configuration.
+    sofa.lp is tried only for 2-dimensional contexts.
+
+    """
+    encodings = [sorted(nconcept.ASP_FILES)]
+    if len(context.sets) == 2:
+        encodings.append(['sofa.lp'])
+    for encoding in encodings:
+        yield {'encoding': encoding, 'options': []}
+        for preset in PRESETS[1:]:
+            yield {'encoding': encoding, 'options': ['--configuration=' + preset]}
+        for heuristic in HEURISTICS:
+            yield {'encoding': encoding, 'options': ['--heuristic=' + heuristic]}
+        for thread in threads:
+            yield {'encoding': encoding, 'options': ['--parallel-mode={}'.format(thread)]}
+
+
+def race(context, configurations:iter, probes:int=50, seed:int=0, repeat:int=REPEAT) -> list:
+    """Return the [(time, configuration)] of given configurations that
+    answered all probes correctly, from the fastest to the slowest.
+
+    The time of a configuration is the minimum over repeat runs
+    of the grounding and all the probes. The first configuration
+    gives the reference answers, so it is always run completely.
+
+    """
+    rng = random.Random(seed)
+    queries = [random_constraints(context, rng) for _ in range(probes)]
+    expected, best, results = None, float('inf'), []
+    for config in configurations:
+        fastest = float('inf')
+        for _ in range(repeat):
+            answers, total = run(context, config, queries, expected, best)
+            if answers is None:  # unsupported or wrong
+                break
+            expected = expected or answers
+            fastest = min(fastest, total)
+        else:
+            if fastest < float('inf'):
+                best = min(best, fastest)
+                results.append((fastest, config))
+    return sorted(results, key=lambda result: result[0])
+
+
+def run(context, config:dict, queries:list, expected:list, limit:float) -> (list, float):
+    """Return the answers of given configuration to given queries, and the
+    time taken, with the grounding.
+
+    Answers are None if the configuration is not supported or gives an
+    answer differing from the expected ones. Time is infinite if the run
+    was stopped for exceeding given time limit. Without expected answers,
+    the run is the reference one, and its errors are raised.
+
+    """
+    start = time.perf_counter()
+    try:
+        session = nconcept.Session(context, config['encoding'], options=config['options'])
+    except RuntimeError:  # option unsupported by this clingo build
+        if expected is None:
+            raise
+        return None, float('inf')
+    answers = []
+    for query in queries:
+        answers.append(session.have_concept(context, query))
+        if expected is not None and answers[-1] != expected[len(answers)-1]:
+            return None, float('inf')
+        if time.perf_counter() - start > limit:
+            return answers, float('inf')
+    return answers, time.perf_counter() - start
+
+
+def tune(context, probes:int=50, seed:int=0, threads:iter=THREADS, repeat:int=REPEAT) -> dict:
+    """Return the fastest configuration for given context, after registering
+    it for the context shape in nconcept.TUNED_CONFIGURATIONS.
+
+    Raise RuntimeError if no configuration answered all the probes.
+
+    """
+    shape = nconcept.context_shape(context)
+    nconcept.TUNED_CONFIGURATIONS.pop(shape, None)  # race from the defaults
+    results = race(context, candidates(context, threads), probes, seed, repeat)
+    if not results:
+        raise RuntimeError("No configuration answered all the probes for shape {}".format(shape))
+    (_, winner), *_ = results
+    nconcept.TUNED_CONFIGURATIONS[shape] = winner
+    return winner
+
+
+def save(path:str=TUNING_FILE):
+    """Write the tuned configurations of all context shapes in given JSON file"""
+    with open(path, 'w') as fd:
+        json.dump(nconcept.TUNED_CONFIGURATIONS, fd, indent=1, sort_keys=True)
+
+
+def load(path:str=TUNING_FILE):
+    """Register the tuned configurations found in given JSON file"""
+    with open(path) as fd:
+        nconcept.TUNED_CONFIGURATIONS.update(json.load(fd))
+
+
+def cli():
+    parser = argparse.ArgumentParser(description='Find the fastest solver configuration for contexts.')
+    parser.add_argument('contexts', nargs='+', help='context files, see loaders.py for formats')
+    parser.add_argument('--input-format', default=None)
+    parser.add_argument('--probes', type=int, default=50,
+                        help='number of existence tests per configuration')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help='number of runs per configuration, keeping the fastest')
+    parser.add_argument('--threads', type=int, nargs='*', default=list(THREADS),
+                        help='numbers of solver threads to try')
+    parser.add_argument('--output', default=TUNING_FILE,
+                        help='JSON file to update with the winners')
+    args = parser.parse_args()
+
+    try:
+        load(args.output)
+    except FileNotFoundError:
+        pass
+    for path in args.contexts:
+        context = loaders.load(path, args.input_format)
+        winner = tune(context, args.probes, args.seed, args.threads, args.repeat)
+        print('{} ({}): {} {}'.format(path, nconcept.context_shape(context),
+                                      ' '.join(winner['encoding']), ' '.join(winner['options'])))
+    save(args.output)
+
+
+if __name__ == "__main__":
+    cli()